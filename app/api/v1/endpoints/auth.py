@@ -3,10 +3,14 @@ import httpx
 import jwt
 import logging
 from fastapi import APIRouter, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from google.cloud.firestore_v1.base_query import FieldFilter
 from firebase_admin import auth, firestore
 
+from app.dependencies.database import customers_collection
+
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 # --- Schemas ---
@@ -26,32 +30,58 @@ class LineLoginResponse(BaseModel):
     firebase_token: str | None = Field(default=None, description="The Firebase custom token, present on successful login.")
     line_profile: LineProfileResponse | None = Field(default=None, description="The user's LINE profile, present if registration is required.")
 
+class LineTokenResponse(BaseModel):
+    """The subset of LINE's token endpoint response that this service uses."""
+    id_token: str | None = Field(None, description="The OpenID Connect ID token issued by LINE.")
+
 # --- Environment Variables ---
 # These should be set in your deployment environment (e.g., Cloud Run environment variables)
 LINE_TOKEN_URL = "https://api.line.me/oauth2/v2.1/token"
 LINE_CHANNEL_ID = os.getenv("LINE_CHANNEL_ID")
 LINE_CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET")
 
-@router.post("/line", response_model=LineLoginResponse)
-async def line_login(payload: LineLoginRequest):
-    """
-    Handles the LINE login/register flow.
+# Budget for a LINE token exchange. Raised from httpx's 5s default: the call sits
+# on the login path, where a slow LINE reply is better than a failed login.
+LINE_API_TIMEOUT = httpx.Timeout(10.0)
 
-    1.  Receives an authorization code from the client.
-    2.  Exchanges the code for a LINE access token and ID token.
-    3.  Verifies the ID token and extracts the LINE User ID.
-    4.  Searches the `customers` collection in Firestore for a matching `lineId`.
-    5.  If a user is found, it returns a Firebase Custom Token for login.
-    6.  If no user is found, it returns a 'registration_required' status with the user's LINE profile data, signaling the client to proceed to a registration screen.
+# One client per app lifespan, so the connection pool and TLS session to
+# api.line.me are reused across logins. Opened and closed by the app lifespan.
+http_client: httpx.AsyncClient | None = None
+
+
+def validate_line_settings() -> None:
+    """
+    Verifies that the LINE channel credentials are configured.
+    Called once at application startup so that a misconfigured deployment fails
+    immediately instead of returning a 500 on every login request.
     """
     if not LINE_CHANNEL_ID or not LINE_CHANNEL_SECRET:
-        logging.error("LINE Channel ID or Secret is not configured on the server.")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Authentication service is not configured."
-        )
+        raise RuntimeError("LINE_CHANNEL_ID and LINE_CHANNEL_SECRET must be set.")
+
+
+def open_http_client() -> None:
+    """
+    Creates the shared LINE API client. Called at application startup, so every
+    lifespan, including an app restarted in the same process, gets its own client.
+    """
+    global http_client
+    http_client = httpx.AsyncClient(timeout=LINE_API_TIMEOUT)
+
+
+async def close_http_client() -> None:
+    """Closes the shared LINE API client. Called once at application shutdown."""
+    global http_client
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
 
-    # 2. Exchange code for tokens
+
+async def _exchange_line_code(payload: LineLoginRequest) -> dict:
+    """
+    Exchanges a LINE authorization code for tokens and returns the verified
+    claims of the LINE ID token. Shared by the login and profile endpoints.
+    """
+    # Exchange code for tokens
     token_payload = {
         "grant_type": "authorization_code",
         "code": payload.authorization_code,
@@ -59,26 +89,29 @@ async def line_login(payload: LineLoginRequest):
         "client_id": LINE_CHANNEL_ID,
         "client_secret": LINE_CHANNEL_SECRET,
     }
-    
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(LINE_TOKEN_URL, data=token_payload)
-            response.raise_for_status()
-            line_data = response.json()
-        except httpx.HTTPStatusError as e:
-            error_detail = e.response.json().get('error_description', 'Unknown LINE API error')
-            logging.error(f"LINE token exchange failed: {e.response.status_code} - {error_detail}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Failed to exchange LINE authorization code: {error_detail}"
-            )
-
-    # 3. Decode ID token and get LINE User ID (sub)
+
+    if http_client is None:
+        raise RuntimeError("The LINE API client is not open; it is created by the app lifespan.")
+
+    try:
+        response = await http_client.post(LINE_TOKEN_URL, data=token_payload)
+        response.raise_for_status()
+        # Parse and validate the raw body in a single pass.
+        line_data = LineTokenResponse.model_validate_json(response.content)
+    except httpx.HTTPStatusError as e:
+        error_detail = e.response.json().get('error_description', 'Unknown LINE API error')
+        logger.error("LINE token exchange failed: %s - %s", e.response.status_code, error_detail)
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Failed to exchange LINE authorization code: {error_detail}"
+        )
+
+    # Decode ID token and get LINE User ID (sub)
     try:
-        id_token = line_data.get("id_token")
+        id_token = line_data.id_token
         if not id_token:
             raise ValueError("id_token not found in LINE response")
-        
+
         # Security Best Practice: Verify the ID token's signature and claims.
         # This ensures the token is authentic, was issued by LINE for your channel,
         # and has not expired.
@@ -89,122 +122,94 @@ async def line_login(payload: LineLoginRequest):
             audience=LINE_CHANNEL_ID,
             issuer="https://access.line.me"
         )
-        line_user_id = decoded_id_token.get("sub")
-        if not line_user_id:
+        if not decoded_id_token.get("sub"):
             raise ValueError("LINE User ID (sub) not found in ID token.")
-        
-        display_name = decoded_id_token.get("name")
-        picture_url = decoded_id_token.get("picture")
-        email = decoded_id_token.get("email")
-
     except Exception as e:
-        logging.error(f"Failed to decode or process LINE ID token: {e}")
+        logger.error("Failed to decode or process LINE ID token: %s", e)
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID token from LINE.")
 
+    return decoded_id_token
+
+
+@router.post("/line", response_model=LineLoginResponse)
+async def line_login(payload: LineLoginRequest):
+    """
+    Handles the LINE login/register flow.
+
+    1.  Receives an authorization code from the client.
+    2.  Exchanges the code for a LINE access token and ID token.
+    3.  Verifies the ID token and extracts the LINE User ID.
+    4.  Searches the `customers` collection in Firestore for a matching `lineId`.
+    5.  If a user is found, it returns a Firebase Custom Token for login.
+    6.  If no user is found, it returns a 'registration_required' status with the user's LINE profile data, signaling the client to proceed to a registration screen.
+    """
+    # 2-3. Exchange the code and verify the ID token.
+    decoded_id_token = await _exchange_line_code(payload)
+    line_user_id = decoded_id_token["sub"]
+    display_name = decoded_id_token.get("name")
+    picture_url = decoded_id_token.get("picture")
+    email = decoded_id_token.get("email")
+
     # 4. Search the `customers` collection for a matching `lineId`.
     db = firestore.client()
-    customers_ref = db.collection("customers")
+    customers_ref = customers_collection(db)
     # Note: This query requires a Firestore index on the 'lineId' field.
     query = customers_ref.where(filter=FieldFilter("lineId", "==", line_user_id)).limit(1)
     
     try:
-        docs = list(query.stream())
-        if docs:
-            # 5. If user exists (Login Flow)
-            customer_doc = docs[0]
-            firebase_uid = customer_doc.id # The document ID is the Firebase UID
-
-            logging.info(f"Found existing customer profile for LINE ID {line_user_id} with Firebase UID {firebase_uid}. Proceeding with login.")
-            
-            # 6. Generate a Firebase Custom Token for that user.
-            try:
-                # Add custom claims to identify the login provider in the Firebase token
-                developer_claims = {'provider': 'line', 'line_user_id': line_user_id}
-                custom_token = auth.create_custom_token(firebase_uid, developer_claims)
-                return LineLoginResponse(status="login_success", firebase_token=custom_token)
-            except Exception as e:
-                logging.error(f"Firebase custom token creation failed for UID {firebase_uid}: {e}")
-                raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to generate authentication token.")
-        else:
-            # 7. If user does not exist (Registration Flow)
-            logging.info(f"No customer profile found for LINE ID {line_user_id}. Signaling for registration.")
-            
-            line_profile_data = LineProfileResponse(
-                line_user_id=line_user_id,
-                display_name=display_name,
-                picture_url=picture_url,
-                email=email
-            )
-            
-            return LineLoginResponse(status="registration_required", line_profile=line_profile_data)
-    except Exception as e:
-        logging.error(f"Firestore query or processing failed for LINE login: {e}")
+        # The Firestore client is synchronous. Run the query in the threadpool
+        # so this async handler does not block the event loop while it waits.
+        # limit(1) yields at most one document; stop reading at the first.
+        customer_doc = await run_in_threadpool(lambda: next(query.stream(), None))
+    except Exception:
+        logger.exception("Firestore query failed for LINE login of LINE ID %s", line_user_id)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="A database error occurred during the login process."
         )
 
+    if customer_doc is None:
+        # 7. If user does not exist (Registration Flow)
+        logger.info("No customer profile found for LINE ID %s. Signaling for registration.", line_user_id)
 
-@router.post("/line/profile", response_model=LineProfileResponse)
-async def get_line_profile(payload: LineLoginRequest):
-    """
-    Exchanges a LINE authorization code for the user's LINE profile data.
-    This endpoint does NOT create or interact with a Firebase user.
-    """
-    if not LINE_CHANNEL_ID or not LINE_CHANNEL_SECRET:
-        logging.error("LINE Channel ID or Secret is not configured on the server.")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Authentication service is not configured."
+        line_profile_data = LineProfileResponse(
+            line_user_id=line_user_id,
+            display_name=display_name,
+            picture_url=picture_url,
+            email=email
         )
 
-    # Exchange code for tokens
-    token_payload = {
-        "grant_type": "authorization_code",
-        "code": payload.authorization_code,
-        "redirect_uri": payload.redirect_uri,
-        "client_id": LINE_CHANNEL_ID,
-        "client_secret": LINE_CHANNEL_SECRET,
-    }
+        return LineLoginResponse(status="registration_required", line_profile=line_profile_data)
+
+    # 5. If user exists (Login Flow)
+    firebase_uid = customer_doc.id # The document ID is the Firebase UID
+
+    logger.info("Found existing customer profile for LINE ID %s with Firebase UID %s. Proceeding with login.", line_user_id, firebase_uid)
 
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(LINE_TOKEN_URL, data=token_payload)
-            response.raise_for_status()
-            line_data = response.json()
-        except httpx.HTTPStatusError as e:
-            error_detail = e.response.json().get('error_description', 'Unknown LINE API error')
-            logging.error(f"LINE token exchange failed: {e.response.status_code} - {error_detail}")
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Failed to exchange LINE authorization code: {error_detail}"
-            )
-
-    # Decode ID token and get LINE User profile
+    # 6. Generate a Firebase Custom Token for that user.
     try:
-        id_token = line_data.get("id_token")
-        if not id_token:
-            raise ValueError("id_token not found in LINE response")
+        # Add custom claims to identify the login provider in the Firebase token
+        developer_claims = {'provider': 'line', 'line_user_id': line_user_id}
+        # Signing can call the IAM signBlob API when running on ADC, so it
+        # is kept off the event loop like the Firestore query above.
+        custom_token = await run_in_threadpool(auth.create_custom_token, firebase_uid, developer_claims)
+    except Exception:
+        logger.exception("Firebase custom token creation failed for UID %s", firebase_uid)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to generate authentication token.")
 
-        # Security Best Practice: Verify the ID token's signature and claims.
-        decoded_id_token = jwt.decode(
-            id_token,
-            LINE_CHANNEL_SECRET,
-            algorithms=["HS256"],
-            audience=LINE_CHANNEL_ID,
-            issuer="https://access.line.me"
-        )
+    return LineLoginResponse(status="login_success", firebase_token=custom_token)
 
-        line_user_id = decoded_id_token.get("sub")
-        if not line_user_id:
-            raise ValueError("LINE User ID (sub) not found in ID token.")
 
-        return LineProfileResponse(
-            line_user_id=line_user_id,
-            display_name=decoded_id_token.get("name"),
-            picture_url=decoded_id_token.get("picture"),
-            email=decoded_id_token.get("email")
-        )
-    except Exception as e:
-        logging.error(f"Failed to decode or process LINE ID token: {e}")
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid ID token from LINE.")
\ No newline at end of file
+@router.post("/line/profile", response_model=LineProfileResponse)
+async def get_line_profile(payload: LineLoginRequest):
+    """
+    Exchanges a LINE authorization code for the user's LINE profile data.
+    This endpoint does NOT create or interact with a Firebase user.
+    """
+    decoded_id_token = await _exchange_line_code(payload)
+    return LineProfileResponse(
+        line_user_id=decoded_id_token["sub"],
+        display_name=decoded_id_token.get("name"),
+        picture_url=decoded_id_token.get("picture"),
+        email=decoded_id_token.get("email")
+    )
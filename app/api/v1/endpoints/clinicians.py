@@ -1,17 +1,27 @@
 from fastapi import APIRouter, Depends, Query, HTTPException, status
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 from firebase_admin import firestore
 from app.api.v1 import schemas
+from app.api.v1.responses import model_response, list_response
 from app.dependencies.auth import get_current_user
+from app.dependencies.database import customers_collection, customer_subcollection
 
 router = APIRouter()
 
 @router.get("/patients", response_model=List[schemas.Customer], response_model_by_alias=False)
-def get_assigned_patients(current_user: Dict = Depends(get_current_user)):
+def get_assigned_patients(
+    limit: Optional[int] = Query(None, ge=1, le=100, description="Page size. Omit to return every assigned patient."),
+    start_after: Optional[str] = Query(None, alias="startAfter", description="The `X-Next-Start-After` value of the previous page."),
+    current_user: Dict = Depends(get_current_user)
+):
     """
-    Retrieves a list of summary profiles for all patients assigned to the
-    authenticated clinician.
+    Retrieves summary profiles for the patients assigned to the authenticated
+    clinician, in `assignedPatients` order.
+
+    Without `limit` every assigned patient is returned. With `limit`, one page
+    is returned, and if more patients remain the `X-Next-Start-After` response
+    header holds the cursor to pass as `startAfter` for the next page.
     """
     clinician_uid = current_user["uid"]
     db = firestore.client()
@@ -28,19 +38,40 @@ def get_assigned_patients(current_user: Dict = Depends(get_current_user)):
     if not assigned_patient_uids:
         return []
 
-    # 3. For each patient UID, fetch the corresponding document from the `customers` collection.
+    # 3. When paging, only the requested slice of UIDs is fetched, so response
+    # size and memory stay bounded by `limit` however many patients are assigned.
+    # Duplicates are dropped (keeping first-seen order) so every UID is a unique,
+    # forward-only cursor; the unpaged full list is returned as stored.
+    if limit is not None or start_after is not None:
+        assigned_patient_uids = list(dict.fromkeys(assigned_patient_uids))
+    start = 0
+    if start_after is not None:
+        try:
+            start = assigned_patient_uids.index(start_after) + 1
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Unknown startAfter cursor")
+    end = len(assigned_patient_uids) if limit is None else start + limit
+    page_uids = assigned_patient_uids[start:end]
+
+    # 4. For each patient UID, fetch the corresponding document from the `customers` collection.
     # Note: This is an N+1 query and can be inefficient.
     # Firestore's `in` operator is limited to 10 items per query. For larger lists,
     # multiple queries or data denormalization would be necessary.
     patients = []
-    for patient_uid in assigned_patient_uids:
-        customer_doc = db.collection("customers").document(patient_uid).get()
+    for patient_uid in page_uids:
+        customer_doc = customers_collection(db).document(patient_uid).get(field_paths=schemas.CUSTOMER_FIELD_PATHS)
         if customer_doc.exists:
             customer_data = customer_doc.to_dict()
             customer_data["patientId"] = customer_doc.id
-            patients.append(schemas.Customer.model_validate(customer_data))
-    
-    return patients
+            patients.append(customer_data)
+
+    adapter = schemas.CUSTOMER_LIST_ADAPTER
+    response = list_response(adapter, adapter.validate_python(patients))
+    # The cursor is the last UID of the slice, not the last patient returned, so
+    # paging still advances past UIDs whose customer document is missing.
+    if end < len(assigned_patient_uids):
+        response.headers["X-Next-Start-After"] = page_uids[-1]
+    return response
 
 @router.get("/patients/{patientId}", response_model=schemas.Customer, response_model_by_alias=False)
 def get_patient_profile(
@@ -65,8 +96,8 @@ def get_patient_profile(
         )
 
     # 2. Fetch the patient's document from the `customers` collection.
-    customer_ref = db.collection("customers").document(patientId)
-    customer_doc = customer_ref.get()
+    customer_ref = customers_collection(db).document(patientId)
+    customer_doc = customer_ref.get(field_paths=schemas.CUSTOMER_FIELD_PATHS)
 
     if not customer_doc.exists:
         raise HTTPException(
@@ -76,7 +107,7 @@ def get_patient_profile(
     
     response_data = customer_doc.to_dict()
     response_data["patientId"] = customer_doc.id
-    return schemas.Customer.model_validate(response_data)
+    return model_response(schemas.Customer.model_validate(response_data))
 
 @router.get("/patients/{patientId}/dailyReports", response_model=List[schemas.DailyReport], response_model_by_alias=False)
 def get_patient_daily_reports(
@@ -101,19 +132,23 @@ def get_patient_daily_reports(
         )
 
     # 2. Fetch reports from `customers/{patientId}/dailyReports`.
-    reports_ref = db.collection("customers").document(patientId).collection("dailyReports")
-    
-    query = reports_ref.order_by("reportDate", direction=firestore.Query.DESCENDING).limit(limit)
+    reports_ref = customer_subcollection(db, patientId, "dailyReports")
+    query = (
+        reports_ref.order_by("reportDate", direction=firestore.Query.DESCENDING)
+        .limit(limit)
+        .select(schemas.DAILY_REPORT_FIELD_PATHS)
+    )
 
     # 3. Return the list of reports.
     reports = []
     for doc in query.stream():
         report_data = doc.to_dict()
         report_data["reportId"] = doc.id
-        reports.append(schemas.DailyReport.model_validate(report_data))
+        reports.append(report_data)
 
     if not reports:
         # It's better to return an empty list than a 404 if the patient exists but has no reports.
         return []
-        
-    return reports
\ No newline at end of file
+
+    adapter = schemas.DAILY_REPORT_LIST_ADAPTER
+    return list_response(adapter, adapter.validate_python(reports))
\ No newline at end of file
@@ -1,13 +1,19 @@
 from fastapi import APIRouter, Depends, status, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from typing import List, Dict
-from datetime import datetime, date, timezone
+from datetime import datetime, timezone
+import asyncio
 import logging
 from google.cloud.firestore_v1.base_query import FieldFilter, And
+from google.api_core.exceptions import AlreadyExists
 from firebase_admin import firestore
 
 from app.api.v1 import schemas
+from app.api.v1.responses import model_response, list_response
 from app.dependencies.auth import get_current_user
+from app.dependencies.database import customers_collection, customer_subcollection
 
+logger = logging.getLogger(__name__)
 router = APIRouter()
 
 @router.post("/me", response_model=schemas.Customer, status_code=status.HTTP_201_CREATED, response_model_by_alias=False)
@@ -23,15 +29,9 @@ def create_customer_profile(
     """
     db = firestore.client()
     user_uid = current_user["uid"]
-    logging.info(f"Attempting to create profile for user UID: {user_uid}")
+    logger.info("Attempting to create profile for user UID: %s", user_uid)
 
-    customer_ref = db.collection("customers").document(user_uid)
-    doc = customer_ref.get()
-    if doc.exists:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail="Customer profile already exists for this user."
-        )
+    customer_ref = customers_collection(db).document(user_uid)
 
     # Use exclude_unset=True for partial updates.
     customer_data = customer_in.model_dump(by_alias=True, exclude_unset=True)
@@ -49,89 +49,83 @@ def create_customer_profile(
 
     customer_data["setupDate"] = datetime.now(timezone.utc)
 
-    # Convert date object to datetime object for Firestore compatibility
-    if isinstance(customer_data.get("dob"), date):
-        customer_data["dob"] = datetime.combine(customer_data["dob"], datetime.min.time())
-
-    logging.info(f"Data to be written for UID {user_uid}: {customer_data}")
+    logger.info("Data to be written for UID %s: %s", user_uid, customer_data)
 
     try:
-        # Use set() for creation.
-        write_result = customer_ref.set(customer_data)
-        logging.info(f"Successfully wrote data for UID {user_uid} at {write_result.update_time}")
+        # create() fails if the document already exists, so the existence check
+        # and the write happen in a single atomic Firestore call.
+        write_result = customer_ref.create(customer_data)
+        logger.info("Successfully wrote data for UID %s at %s", user_uid, write_result.update_time)
+    except AlreadyExists:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Customer profile already exists for this user."
+        )
     except Exception as e:
-        logging.error(f"Failed to write to Firestore for UID {user_uid}: {e}")
+        logger.error("Failed to write to Firestore for UID %s: %s", user_uid, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not create customer profile in database."
         )
 
-    new_customer_doc = customer_ref.get()
-    if not new_customer_doc.exists:
-        logging.error(f"Data for UID {user_uid} was not found immediately after write.")
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to retrieve customer profile after creation.")
+    # Build the response from the data just written instead of reading it back.
+    response_data = {**customer_data, "patientId": user_uid}
+
+    return model_response(schemas.Customer.model_validate(response_data), status.HTTP_201_CREATED)
 
-    response_data = new_customer_doc.to_dict()
-    response_data["patientId"] = new_customer_doc.id
 
-    return schemas.Customer.model_validate(response_data)
+def _read_subcollection(collection_ref, id_field: str, field_paths: List[str]) -> List[Dict]:
+    """
+    Reads every document in an equipment sub-collection, adding the document ID under `id_field`.
+    Only `field_paths` are fetched from Firestore.
+    """
+    items = []
+    for doc in collection_ref.select(field_paths).stream():
+        item_data = doc.to_dict()
+        item_data[id_field] = doc.id
+        items.append(item_data)
+    return items
 
 
 @router.get("/me", response_model=schemas.Customer, response_model_by_alias=False)
-def get_my_profile(current_user: Dict = Depends(get_current_user)):
+async def get_my_profile(current_user: Dict = Depends(get_current_user)):
     """
     Retrieve the profile of the currently authenticated user, including their equipment.
     """
     db = firestore.client()
     user_uid = current_user["uid"]
-    logging.info(f"Attempting to retrieve profile for user UID: {user_uid}")
-    customer_ref = db.collection("customers").document(user_uid)
+    logger.info("Attempting to retrieve profile for user UID: %s", user_uid)
+    customer_ref = customers_collection(db).document(user_uid)
 
+    # The profile and its devices, masks and air tubing sub-collections are
+    # independent reads, so issue them concurrently rather than one after another.
+    # The Firestore client is synchronous, so each read runs in the threadpool.
     try:
-        doc = customer_ref.get()
+        doc, devices, masks, tubes = await asyncio.gather(
+            run_in_threadpool(customer_ref.get, field_paths=schemas.CUSTOMER_FIELD_PATHS),
+            run_in_threadpool(_read_subcollection, customer_subcollection(db, user_uid, "devices"), "deviceId", schemas.DEVICE_FIELD_PATHS),
+            run_in_threadpool(_read_subcollection, customer_subcollection(db, user_uid, "masks"), "maskId", schemas.MASK_FIELD_PATHS),
+            run_in_threadpool(_read_subcollection, customer_subcollection(db, user_uid, "airTubing"), "tubingId", schemas.AIR_TUBING_FIELD_PATHS),
+        )
     except Exception as e:
-        logging.error(f"Failed to query Firestore for UID {user_uid}: {e}")
+        logger.error("Failed to query Firestore for UID %s: %s", user_uid, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Could not query customer profile from database."
         )
 
     if not doc.exists:
-        logging.warning(f"Profile for user UID: {user_uid} not found.")
+        logger.warning("Profile for user UID: %s not found.", user_uid)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer profile not found")
 
-    logging.info(f"Successfully retrieved profile for UID: {user_uid}")
+    logger.info("Successfully retrieved profile for UID: %s", user_uid)
     response_data = doc.to_dict()
     response_data["patientId"] = doc.id
-
-    # Fetch devices sub-collection
-    devices = []
-    devices_ref = customer_ref.collection("devices")
-    for device_doc in devices_ref.stream():
-        device_data = device_doc.to_dict()
-        device_data["deviceId"] = device_doc.id
-        devices.append(device_data)
     response_data["devices"] = devices
-
-    # Fetch masks sub-collection
-    masks = []
-    masks_ref = customer_ref.collection("masks")
-    for mask_doc in masks_ref.stream():
-        mask_data = mask_doc.to_dict()
-        mask_data["maskId"] = mask_doc.id
-        masks.append(mask_data)
     response_data["masks"] = masks
-
-    # Fetch air tubing sub-collection
-    tubes = []
-    tubing_ref = customer_ref.collection("airTubing")
-    for tube_doc in tubing_ref.stream():
-        tube_data = tube_doc.to_dict()
-        tube_data["tubingId"] = tube_doc.id
-        tubes.append(tube_data)
     response_data["airTubing"] = tubes
 
-    return schemas.Customer.model_validate(response_data)
+    return model_response(schemas.Customer.model_validate(response_data))
 
 
 @router.post("/me/devices", response_model=schemas.Device, status_code=status.HTTP_201_CREATED, response_model_by_alias=False)
@@ -145,20 +139,20 @@ def add_a_device(
     """
     db = firestore.client()
     user_uid = current_user["uid"]
-    devices_ref = db.collection("customers").document(user_uid).collection("devices")
+    devices_ref = customer_subcollection(db, user_uid, "devices")
 
     device_data = device_in.model_dump(by_alias=True)
     device_data["addedDate"] = datetime.now(timezone.utc)
 
     # .add() creates a new document with an auto-generated ID
-    update_time, new_device_ref = devices_ref.add(device_data)
+    _update_time, new_device_ref = devices_ref.add(device_data)
 
-    # To return the full object including the new ID, we fetch the document we just created
-    new_device_doc = new_device_ref.get()
-    response_data = new_device_doc.to_dict()
-    response_data["deviceId"] = new_device_doc.id
-
-    return schemas.Device.model_validate(response_data)
+    # The written data plus the generated ID is the full object; no need to read it back.
+    # device_in is already validated, so the response is assembled without a second pass.
+    device = schemas.Device.model_construct(
+        **dict(device_in), device_id=new_device_ref.id, added_date=device_data["addedDate"]
+    )
+    return model_response(device, status.HTTP_201_CREATED)
 
 
 @router.get("/me/devices", response_model=List[schemas.Device], response_model_by_alias=False)
@@ -168,16 +162,13 @@ def get_my_devices(current_user: Dict = Depends(get_current_user)):
     """
     db = firestore.client()
     user_uid = current_user["uid"]
-    devices_ref = db.collection("customers").document(user_uid).collection("devices")
+    devices_ref = customer_subcollection(db, user_uid, "devices")
     
-    devices = []
     # stream() is an efficient way to iterate over all documents in a collection
-    for doc in devices_ref.stream():
-        device_data = doc.to_dict()
-        device_data["deviceId"] = doc.id
-        devices.append(schemas.Device.model_validate(device_data))
-        
-    return devices
+    devices = _read_subcollection(devices_ref, "deviceId", schemas.DEVICE_FIELD_PATHS)
+
+    adapter = schemas.DEVICE_LIST_ADAPTER
+    return list_response(adapter, adapter.validate_python(devices))
 
 
 @router.post("/me/masks", response_model=schemas.Mask, status_code=status.HTTP_201_CREATED, response_model_by_alias=False)
@@ -191,18 +182,17 @@ def add_a_mask(
     """
     db = firestore.client()
     user_uid = current_user["uid"]
-    masks_ref = db.collection("customers").document(user_uid).collection("masks")
+    masks_ref = customer_subcollection(db, user_uid, "masks")
 
     mask_data = mask_in.model_dump(by_alias=True)
     mask_data["addedDate"] = datetime.now(timezone.utc)
 
     _update_time, new_mask_ref = masks_ref.add(mask_data)
 
-    new_mask_doc = new_mask_ref.get()
-    response_data = new_mask_doc.to_dict()
-    response_data["maskId"] = new_mask_doc.id
-
-    return schemas.Mask.model_validate(response_data)
+    mask = schemas.Mask.model_construct(
+        **dict(mask_in), mask_id=new_mask_ref.id, added_date=mask_data["addedDate"]
+    )
+    return model_response(mask, status.HTTP_201_CREATED)
 
 
 @router.get("/me/masks", response_model=List[schemas.Mask], response_model_by_alias=False)
@@ -212,15 +202,12 @@ def get_my_masks(current_user: Dict = Depends(get_current_user)):
     """
     db = firestore.client()
     user_uid = current_user["uid"]
-    masks_ref = db.collection("customers").document(user_uid).collection("masks")
+    masks_ref = customer_subcollection(db, user_uid, "masks")
     
-    masks = []
-    for doc in masks_ref.stream():
-        mask_data = doc.to_dict()
-        mask_data["maskId"] = doc.id
-        masks.append(schemas.Mask.model_validate(mask_data))
-        
-    return masks
+    masks = _read_subcollection(masks_ref, "maskId", schemas.MASK_FIELD_PATHS)
+
+    adapter = schemas.MASK_LIST_ADAPTER
+    return list_response(adapter, adapter.validate_python(masks))
 
 
 @router.post("/me/airTubing", response_model=schemas.AirTubing, status_code=status.HTTP_201_CREATED, response_model_by_alias=False)
@@ -234,18 +221,17 @@ def add_air_tubing(
     """
     db = firestore.client()
     user_uid = current_user["uid"]
-    tubing_ref = db.collection("customers").document(user_uid).collection("airTubing")
+    tubing_ref = customer_subcollection(db, user_uid, "airTubing")
 
     tubing_data = tubing_in.model_dump(by_alias=True)
     tubing_data["addedDate"] = datetime.now(timezone.utc)
 
     _update_time, new_tubing_ref = tubing_ref.add(tubing_data)
 
-    new_tubing_doc = new_tubing_ref.get()
-    response_data = new_tubing_doc.to_dict()
-    response_data["tubingId"] = new_tubing_doc.id
-
-    return schemas.AirTubing.model_validate(response_data)
+    tubing = schemas.AirTubing.model_construct(
+        **dict(tubing_in), tubing_id=new_tubing_ref.id, added_date=tubing_data["addedDate"]
+    )
+    return model_response(tubing, status.HTTP_201_CREATED)
 
 
 @router.get("/me/airTubing", response_model=List[schemas.AirTubing], response_model_by_alias=False)
@@ -255,15 +241,12 @@ def get_my_air_tubing(current_user: Dict = Depends(get_current_user)):
     """
     db = firestore.client()
     user_uid = current_user["uid"]
-    tubing_ref = db.collection("customers").document(user_uid).collection("airTubing")
+    tubing_ref = customer_subcollection(db, user_uid, "airTubing")
     
-    tubes = []
-    for doc in tubing_ref.stream():
-        tubing_data = doc.to_dict()
-        tubing_data["tubingId"] = doc.id
-        tubes.append(schemas.AirTubing.model_validate(tubing_data))
-        
-    return tubes
+    tubes = _read_subcollection(tubing_ref, "tubingId", schemas.AIR_TUBING_FIELD_PATHS)
+
+    adapter = schemas.AIR_TUBING_LIST_ADAPTER
+    return list_response(adapter, adapter.validate_python(tubes))
 
 
 @router.post("/me/link-device", response_model=schemas.Customer, status_code=status.HTTP_200_OK, response_model_by_alias=False)
@@ -295,25 +278,25 @@ def link_device_to_profile(
         ])
     ).limit(1)
     try:
-        device_docs = list(device_query.stream())
+        # limit(1) yields at most one document; stop reading at the first.
+        found_device_doc = next(device_query.stream(), None)
     except Exception as e:
-        logging.error(f"Firestore query for device SN {link_request.serial_number} failed: {e}")
+        logger.error("Firestore query for device SN %s failed: %s", link_request.serial_number, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="A database error occurred while searching for the device."
         )
 
-    if not device_docs:
+    if found_device_doc is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No patient record found for the provided Serial Number."
         )
 
     # 2. Get the parent customer profile from the found device.
-    found_device_doc = device_docs[0]
     device_data = found_device_doc.to_dict()
 
-    logging.info(f"Found device doc with ID: {found_device_doc.id} for SN: {link_request.serial_number}. Data: {device_data}")
+    logger.info("Found device doc with ID: %s for SN: %s. Data: %s", found_device_doc.id, link_request.serial_number, device_data)
     # The device doc's parent is the 'devices' collection, whose parent is the customer document.
     pre_existing_customer_ref = found_device_doc.reference.parent.parent
 
@@ -324,18 +307,27 @@ def link_device_to_profile(
         # Check for a reference field within the device document itself.
         patient_id = device_data.get("patientId")
         if not patient_id:
-            logging.error(f"Device {found_device_doc.id} is a root-level document but does not contain a patient reference field like 'patientId'.")
+            logger.error("Device %s is a root-level document but does not contain a patient reference field like 'patientId'.", found_device_doc.id)
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Device found, but it is not linked to any patient profile."
             )
-        logging.info(f"Device is a root document. Looking up patient via 'patientId' field: {patient_id}")
+        logger.info("Device is a root document. Looking up patient via 'patientId' field: %s", patient_id)
         pre_existing_customer_ref = db.collection("patient_list").document(patient_id)
-    pre_existing_customer_doc = pre_existing_customer_ref.get()
 
+    # The pre-existing profile and the current user's profile (needed in step 4)
+    # are fetched together in one batched read. get_all() does not preserve the
+    # request order, so the snapshots are matched back to their references by path.
+    current_user_customer_ref = customers_collection(db).document(user_uid)
+    snapshots = {
+        snapshot.reference.path: snapshot
+        for snapshot in db.get_all([pre_existing_customer_ref, current_user_customer_ref])
+    }
+    pre_existing_customer_doc = snapshots[pre_existing_customer_ref.path]
+    current_user_doc = snapshots[current_user_customer_ref.path]
 
     if not pre_existing_customer_doc.exists:
-        logging.error(f"Device {found_device_doc.id} found for SN {link_request.serial_number}, but parent customer {pre_existing_customer_ref.id} does not exist.")
+        logger.error("Device %s found for SN %s, but parent customer %s does not exist.", found_device_doc.id, link_request.serial_number, pre_existing_customer_ref.id)
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="A device was found, but its associated patient profile is missing."
@@ -352,17 +344,15 @@ def link_device_to_profile(
             # mutating the original data that will be merged into the 'customers' profile.
             data_for_patients = pre_existing_customer_data.copy()
             data_for_patients["customerId"] = user_uid # This links the patient record back to the LINE user.
-            logging.info(f"Copying customer profile {pre_existing_customer_doc.id} to 'patient_list' collection with ID {patient_id_from_device}")
+            logger.info("Copying customer profile %s to 'patient_list' collection with ID %s", pre_existing_customer_doc.id, patient_id_from_device)
             db.collection("patient_list").document(patient_id_from_device).set(data_for_patients, merge=True)
         except Exception as e:
             # This is treated as a non-critical error. The primary linking can still proceed.
-            logging.warning(f"Could not copy profile to 'patient_list' collection for patientId {patient_id_from_device}: {e}")
+            logger.warning("Could not copy profile to 'patient_list' collection for patientId %s: %s", patient_id_from_device, e)
     else:
-        logging.info(f"Device document {found_device_doc.id} does not contain a 'patientId' field. Skipping copy to 'patient_list' collection.")
+        logger.info("Device document %s does not contain a 'patientId' field. Skipping copy to 'patient_list' collection.", found_device_doc.id)
 
-    # 4. Fetch the current user's profile to preserve key identity fields like lineProfile.
-    current_user_customer_ref = db.collection("customers").document(user_uid)
-    current_user_doc = current_user_customer_ref.get()
+    # 4. Use the current user's profile to preserve key identity fields like lineProfile.
     current_user_data = current_user_doc.to_dict() if current_user_doc.exists else {}
 
     # 5. Manually merge data to ensure the user's LINE identity is the source of truth.
@@ -390,18 +380,18 @@ def link_device_to_profile(
     try:
         # Perform a full write of the constructed data. This is safer than a blind merge.
         current_user_customer_ref.set(data_to_write)
-        logging.info(f"Successfully merged data from profile {pre_existing_customer_doc.id} to profile {user_uid}")
+        logger.info("Successfully merged data from profile %s to profile %s", pre_existing_customer_doc.id, user_uid)
     except Exception as e:
-        logging.error(f"Failed to merge Firestore data for UID {user_uid}: {e}")
+        logger.error("Failed to merge Firestore data for UID %s: %s", user_uid, e)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Could not link device to customer profile.")
 
     # Mark the original device document as linked to this customer to prevent re-linking.
     try:
         found_device_doc.reference.update({"customerId": user_uid, "status": "active"})
-        logging.info(f"Successfully updated original device doc {found_device_doc.id} with customerId {user_uid}.")
+        logger.info("Successfully updated original device doc %s with customerId %s.", found_device_doc.id, user_uid)
     except Exception as e:
         # This is a non-critical error for the user flow, but should be logged as a warning.
-        logging.warning(f"Could not update original device doc {found_device_doc.id} with customerId: {e}")
+        logger.warning("Could not update original device doc %s with customerId: %s", found_device_doc.id, e)
 
 
     # 6. Create a record of the linked device in the user's 'devices' sub-collection.
@@ -425,19 +415,19 @@ def link_device_to_profile(
         new_device_data_cleaned = {k: v for k, v in new_device_data.items() if v is not None}
 
         devices_ref.add(new_device_data_cleaned)
-        logging.info(f"Successfully created a new device entry for user {user_uid} from the linking process.")
+        logger.info("Successfully created a new device entry for user %s from the linking process.", user_uid)
     except Exception as e:
-        logging.warning(f"Could not create device entry for user {user_uid} after linking: {e}")
+        logger.warning("Could not create device entry for user %s after linking: %s", user_uid, e)
 
     # 7. Return the updated profile of the current user.
-    updated_doc = current_user_customer_ref.get()
+    updated_doc = current_user_customer_ref.get(field_paths=schemas.CUSTOMER_FIELD_PATHS)
     if not updated_doc.exists:
-        logging.error(f"Data for UID {user_uid} was not found immediately after merge.")
+        logger.error("Data for UID %s was not found immediately after merge.", user_uid)
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Failed to retrieve customer profile after linking.")
 
     response_data = updated_doc.to_dict()
     response_data["patientId"] = updated_doc.id
-    return schemas.Customer.model_validate(response_data)
+    return model_response(schemas.Customer.model_validate(response_data))
 
 @router.post("/me/dailyReports", response_model=schemas.DailyReport, status_code=status.HTTP_201_CREATED, response_model_by_alias=False)
 def submit_daily_report(
@@ -451,27 +441,17 @@ def submit_daily_report(
     db = firestore.client()
     user_uid = current_user["uid"]
     report_id = report_in.report_date.strftime('%Y-%m-%d')
-    report_ref = db.collection("customers").document(user_uid).collection("dailyReports").document(report_id)
+    report_ref = customer_subcollection(db, user_uid, "dailyReports").document(report_id)
 
+    # reportDate is dumped as a datetime, which is what Firestore stores.
     report_data = report_in.model_dump(by_alias=True)
-    # Convert date object to datetime object for Firestore compatibility
-    if isinstance(report_data.get("reportDate"), date):
-        report_data["reportDate"] = datetime.combine(report_data["reportDate"], datetime.min.time())
 
     report_ref.set(report_data)
 
-    # Fetch the document back to ensure a consistent response and confirm the write.
-    new_report_doc = report_ref.get()
-    if not new_report_doc.exists:
-        logging.error(f"Data for report {report_id} was not found immediately after write for UID {user_uid}.")
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="Failed to retrieve report after creation."
-        )
-
-    response_data = new_report_doc.to_dict()
-    response_data["reportId"] = new_report_doc.id
-    return schemas.DailyReport.model_validate(response_data)
+    # set() raises on failure, so the written data is what is stored; no need to read it back.
+    # report_in is already validated, so the response is assembled without a second pass.
+    report = schemas.DailyReport.model_construct(**dict(report_in), report_id=report_id)
+    return model_response(report, status.HTTP_201_CREATED)
 
 
 @router.get("/me/latest-prescription", response_model=schemas.PrescriptionResponse, response_model_by_alias=False)
@@ -483,55 +463,51 @@ def get_latest_prescription(current_user: Dict = Depends(get_current_user)):
     """
     db = firestore.client()
     user_uid = current_user["uid"]
-    logging.info(f"Attempting to retrieve latest prescription for user UID: {user_uid}")
+    logger.info("Attempting to retrieve latest prescription for user UID: %s", user_uid)
 
     # 1. Get the user's customer profile to find their patientId (airviewId).
-    customer_ref = db.collection("customers").document(user_uid)
+    customer_ref = customers_collection(db).document(user_uid)
     try:
         customer_doc = customer_ref.get()
-        if not customer_doc.exists:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer profile not found.")
-        
-        customer_data = customer_doc.to_dict()
-        patient_id = customer_data.get("patientId")
-
-        if not patient_id:
-            logging.warning(f"User {user_uid} has not linked a device and has no patientId.")
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No linked patient record found for this user.")
-
-    except HTTPException:
-        raise # Re-raise HTTP exceptions
     except Exception as e:
-        logging.error(f"Failed to retrieve customer profile for UID {user_uid}: {e}")
+        logger.error("Failed to retrieve customer profile for UID %s: %s", user_uid, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="A database error occurred while fetching user profile."
         )
 
+    if not customer_doc.exists:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Customer profile not found.")
+
+    patient_id = customer_doc.to_dict().get("patientId")
+    if not patient_id:
+        logger.warning("User %s has not linked a device and has no patientId.", user_uid)
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No linked patient record found for this user.")
+
     # 2. Use the patientId to query the `patient_list` collection for the latest prescription.
-    logging.info(f"Found patientId '{patient_id}' for user UID {user_uid}. Querying patient_list.")
+    logger.info("Found patientId '%s' for user UID %s. Querying patient_list.", patient_id, user_uid)
     prescriptions_ref = db.collection("patient_list").document(patient_id).collection("prescriptions")
     
     # The logic to find the "latest" remains the same: order by a date field.
     query = prescriptions_ref.order_by("addedDate", direction=firestore.Query.DESCENDING).limit(1)
 
     try:
-        docs = list(query.stream())
+        prescription_doc = next(query.stream(), None)
     except Exception as e:
         # This could be a "NOT_FOUND" if the index doesn't exist, which is a developer error.
         # Or other query failures.
-        logging.error(f"Firestore query for latest prescription failed for patientId {patient_id}: {e}")
+        logger.error("Firestore query for latest prescription failed for patientId %s: %s", patient_id, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="A database error occurred while fetching the prescription."
         )
 
-    if not docs:
-        logging.warning(f"No prescription found for patientId: {patient_id}")
+    if prescription_doc is None:
+        logger.warning("No prescription found for patientId: %s", patient_id)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No prescription found for this user.")
 
-    prescription_data = docs[0].to_dict()
-    return schemas.PrescriptionResponse.model_validate(prescription_data)
+    prescription_data = prescription_doc.to_dict()
+    return model_response(schemas.PrescriptionResponse.model_validate(prescription_data))
 
 @router.get("/me/dailyReports", response_model=List[schemas.DailyReport], response_model_by_alias=False)
 def get_my_daily_reports(
@@ -543,14 +519,19 @@ def get_my_daily_reports(
     """
     db = firestore.client()
     user_uid = current_user["uid"]
-    reports_ref = db.collection("customers").document(user_uid).collection("dailyReports")
+    reports_ref = customer_subcollection(db, user_uid, "dailyReports")
 
-    query = reports_ref.order_by("reportDate", direction=firestore.Query.DESCENDING).limit(limit)
+    query = (
+        reports_ref.order_by("reportDate", direction=firestore.Query.DESCENDING)
+        .limit(limit)
+        .select(schemas.DAILY_REPORT_FIELD_PATHS)
+    )
     
     reports = []
     for doc in query.stream():
         report_data = doc.to_dict()
         report_data["reportId"] = doc.id
-        reports.append(schemas.DailyReport.model_validate(report_data))
-        
-    return reports
\ No newline at end of file
+        reports.append(report_data)
+
+    adapter = schemas.DAILY_REPORT_LIST_ADAPTER
+    return list_response(adapter, adapter.validate_python(reports))
\ No newline at end of file
@@ -0,0 +1,23 @@
+from typing import Any
+
+from fastapi import Response, status
+from pydantic import BaseModel, TypeAdapter
+
+
+def model_response(model: BaseModel, status_code: int = status.HTTP_200_OK) -> Response:
+    """
+    Serializes an already-validated response model straight to JSON bytes with
+    pydantic-core. Returning a `Response` skips FastAPI's second validation and
+    `jsonable_encoder` pass over the return value; the route's `response_model`
+    is still used for the OpenAPI schema.
+
+    Field names (not aliases) are emitted, matching `response_model_by_alias=False`.
+    """
+    return Response(content=model.model_dump_json(), media_type="application/json", status_code=status_code)
+
+
+def list_response(adapter: TypeAdapter, items: list[Any], status_code: int = status.HTTP_200_OK) -> Response:
+    """
+    Serializes a list of validated models in one call using the list's `TypeAdapter`.
+    """
+    return Response(content=adapter.dump_json(items), media_type="application/json", status_code=status_code)
@@ -1,8 +1,16 @@
 # Location: app/api/v1/schemas.py
 
-from pydantic import BaseModel, Field, ConfigDict
-from datetime import datetime, date
-from typing import Optional, Dict, List
+from pydantic import BaseModel, Field, ConfigDict, PlainSerializer, StringConstraints, TypeAdapter
+from datetime import datetime, date, time
+from typing import Annotated, Any, Optional
+
+# --- Shared Field Types ---
+# The device's 3-digit device number (DN), shared by every schema that accepts one.
+DeviceNumber = Annotated[str, StringConstraints(min_length=3, max_length=3)]
+
+# A calendar date in a request body. Firestore only stores timestamps, so the
+# payload dumps it as a midnight datetime ready to be written as-is.
+FirestoreDate = Annotated[date, PlainSerializer(lambda d: datetime.combine(d, time.min), return_type=datetime)]
 
 # --- Base Schemas for Maps ---
 class ComplianceMap(BaseModel):
@@ -77,7 +85,7 @@ class CustomerProfilePayload(BaseModel):
     title: Optional[str] = None
     first_name: Optional[str] = Field(None, alias="firstName")
     last_name: Optional[str] = Field(None, alias="lastName")
-    dob: Optional[date] = None
+    dob: Optional[FirestoreDate] = None
     phone_number: Optional[str] = Field(None, alias="phoneNumber")
     location: Optional[str] = None
     status: Optional[str] = None
@@ -99,9 +107,9 @@ class Customer(CustomerBase):
     data_access: Optional[DataAccessMap] = Field(None, alias="dataAccess")
     is_compliant: Optional[bool] = Field(None, alias="isCompliant")
     last_30_days_compliance: Optional[float] = Field(None, alias="last30DaysCompliance")
-    devices: Optional[List['Device']] = None
-    masks: Optional[List['Mask']] = None
-    air_tubing: Optional[List['AirTubing']] = Field(None, alias="airTubing")
+    devices: Optional[list['Device']] = None
+    masks: Optional[list['Mask']] = None
+    air_tubing: Optional[list['AirTubing']] = Field(None, alias="airTubing")
     model_config = ConfigDict(populate_by_name=True, from_attributes=True)
 
 # --- Prescription Schemas ---
@@ -159,9 +167,9 @@ class PrescriptionResponse(BaseModel):
 class DeviceBase(BaseModel):
     device_name: str = Field(..., alias="deviceName")
     serial_number: str = Field(..., alias="serialNumber")
-    device_number: str = Field(..., alias="deviceNumber", min_length=3, max_length=3, description="The device's unique 3-digit device number (DN).")
+    device_number: DeviceNumber = Field(..., alias="deviceNumber", description="The device's unique 3-digit device number (DN).")
     status: str = "Active"
-    settings: Optional[Dict] = None
+    settings: Optional[dict[str, Any]] = None
     model_config = ConfigDict(populate_by_name=True)
 
 class DeviceCreate(DeviceBase):
@@ -174,8 +182,10 @@ class Device(DeviceBase):
 
 class DeviceLinkRequest(BaseModel):
     serial_number: str = Field(..., alias="serialNumber", description="The device's unique serial number (SN).")
-    device_number: str = Field(..., alias="deviceNumber", min_length=3, max_length=3, description="The device's unique 3-digit device number (DN).")
-    model_config = ConfigDict(populate_by_name=True)
+    device_number: DeviceNumber = Field(..., alias="deviceNumber", description="The device's unique 3-digit device number (DN).")
+    # Stray whitespace from copy/paste or scanners would otherwise never match
+    # a stored serial, yet still cost a collection-group query.
+    model_config = ConfigDict(populate_by_name=True, str_strip_whitespace=True)
 
 class MaskBase(BaseModel):
     mask_name: str = Field(..., alias="maskName")
@@ -211,12 +221,40 @@ class DailyReportBase(BaseModel):
     leak: LeakMap
     pressure: PressureMap
     events_per_hour: EventsPerHourMap = Field(..., alias="eventsPerHour")
-    device_snapshot: Optional[Dict] = Field(None, alias="deviceSnapshot")
+    # Opaque device telemetry; stored and returned as-is without per-key validation.
+    device_snapshot: Optional[dict[str, Any]] = Field(None, alias="deviceSnapshot")
     model_config = ConfigDict(populate_by_name=True)
 
 class DailyReportCreate(DailyReportBase):
-    pass
+    report_date: FirestoreDate = Field(..., alias="reportDate")
 
 class DailyReport(DailyReportBase):
     report_id: str = Field(..., alias="reportId") # Will be the YYYY-MM-DD date string
-    model_config = ConfigDict(populate_by_name=True, from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(populate_by_name=True, from_attributes=True)
+
+# --- Firestore Projections ---
+# Documents can carry fields the API never returns (e.g. data copied over while
+# linking, or extra device telemetry). Reading only the fields the response model
+# declares keeps the payload and the decoded dict no larger than the response.
+# `exclude` names the fields the handlers fill from the document ID or from
+# sub-collections, which are not stored on the document itself.
+def _field_paths(model: type[BaseModel], exclude: tuple[str, ...] = ()) -> list[str]:
+    unknown = set(exclude) - model.model_fields.keys()
+    if unknown:
+        raise ValueError(f"{model.__name__} has no fields {sorted(unknown)}")
+    return [field.alias or name for name, field in model.model_fields.items() if name not in exclude]
+
+CUSTOMER_FIELD_PATHS = _field_paths(Customer, exclude=("patient_id", "devices", "masks", "air_tubing"))
+DEVICE_FIELD_PATHS = _field_paths(Device, exclude=("device_id",))
+MASK_FIELD_PATHS = _field_paths(Mask, exclude=("mask_id",))
+AIR_TUBING_FIELD_PATHS = _field_paths(AirTubing, exclude=("tubing_id",))
+DAILY_REPORT_FIELD_PATHS = _field_paths(DailyReport, exclude=("report_id",))
+
+# --- List Adapters ---
+# Validate whole result sets in a single pydantic-core call instead of one
+# model_validate() per document.
+CUSTOMER_LIST_ADAPTER = TypeAdapter(list[Customer])
+DEVICE_LIST_ADAPTER = TypeAdapter(list[Device])
+MASK_LIST_ADAPTER = TypeAdapter(list[Mask])
+AIR_TUBING_LIST_ADAPTER = TypeAdapter(list[AirTubing])
+DAILY_REPORT_LIST_ADAPTER = TypeAdapter(list[DailyReport])
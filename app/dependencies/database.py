@@ -0,0 +1,65 @@
+import os
+import logging
+from functools import lru_cache
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+from google.cloud.firestore_v1.client import Client
+from google.cloud.firestore_v1.collection import CollectionReference
+
+logger = logging.getLogger(__name__)
+
+CUSTOMERS_COLLECTION = "customers"
+
+
+def initialize_firebase_app() -> None:
+    """
+    Initializes the Firebase Admin SDK for this process. Safe to call more than once.
+
+    Uses Application Default Credentials: set GOOGLE_APPLICATION_CREDENTIALS locally;
+    in Cloud Run this is handled automatically if the service account is set.
+    """
+    try:
+        if not firebase_admin._apps:
+            cred = credentials.ApplicationDefault()
+            firebase_admin.initialize_app(cred, {
+                'projectId': os.getenv('GOOGLE_CLOUD_PROJECT'),
+            })
+    except Exception as e:
+        logger.error("Could not initialize Firebase Admin SDK: %s", e)
+        # Depending on the use case, you might want to exit the application
+        # if Firebase connection is essential for all operations.
+
+
+@lru_cache(maxsize=1)
+def customers_collection(db: Client) -> CollectionReference:
+    """
+    Returns the `customers` CollectionReference for the given Firestore client.
+    The process uses a single client, so the reference is built once and reused
+    by every request instead of being rebuilt in each handler.
+    """
+    return db.collection(CUSTOMERS_COLLECTION)
+
+
+@lru_cache(maxsize=4096)
+def customer_subcollection(db: Client, customer_id: str, name: str) -> CollectionReference:
+    """
+    Returns `customers/{customer_id}/{name}`. A patient polling from the LIFF app
+    hits the same few sub-collections repeatedly, so the references are kept in a
+    bounded LRU rather than rebuilt from the collection path on every request.
+    """
+    return customers_collection(db).document(customer_id).collection(name)
+
+
+def warm_up_firestore() -> None:
+    """
+    Issues a trivial read so the gRPC channel, TLS session and OAuth token are
+    established during startup rather than on the first user request.
+    Failures are logged and otherwise ignored.
+    """
+    try:
+        db = firestore.client()
+        # An empty projection returns at most one document name and no fields.
+        customers_collection(db).select([]).limit(1).get(timeout=10)
+    except Exception as e:
+        logger.warning("Firestore warm-up read failed: %s", e)
@@ -1,37 +1,86 @@
-import os
 import logging
-import firebase_admin
-from firebase_admin import credentials
+import logging.handlers
+import queue
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.endpoints import auth, customers, clinicians
+from app.dependencies.database import initialize_firebase_app, warm_up_firestore
 
 # --- Logging Configuration ---
 # Configure logging at the application's entry point.
 # Cloud Run will automatically handle log output to Cloud Logging.
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+# While the app is running, loggers only enqueue records; one listener thread owns
+# the stream handler and does the blocking writes, so request handlers never wait
+# on stderr. Outside a lifespan (e.g. at import) records go straight to the stream.
+_log_queue = queue.SimpleQueue()
+_log_stream_handler = logging.StreamHandler()
+_log_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_log_queue_handler = logging.handlers.QueueHandler(_log_queue)
+# The listener's handler applies the real format; the queue side only merges the
+# message with its arguments.
+_log_queue_handler.setFormatter(logging.Formatter('%(message)s'))
+_log_listener = logging.handlers.QueueListener(_log_queue, _log_stream_handler)
+logging.basicConfig(level=logging.INFO, handlers=[_log_stream_handler])
+logger = logging.getLogger(__name__)
 
-# --- Firebase Admin SDK Initialization ---
-# It's crucial to initialize the app only once.
-# Use GOOGLE_APPLICATION_CREDENTIALS environment variable for security.
-# In Cloud Run, this is handled automatically if the service account is set.
-try:
-    if not firebase_admin._apps:
-        cred = credentials.ApplicationDefault()
-        firebase_admin.initialize_app(cred, {
-            'projectId': os.getenv('GOOGLE_CLOUD_PROJECT'),
-        })
-except Exception as e:
-    logging.error(f"Could not initialize Firebase Admin SDK: {e}")
-    # Depending on the use case, you might want to exit the application
-    # if Firebase connection is essential for all operations.
+
+def _start_log_listener() -> None:
+    """Starts the listener thread and routes root logging through the queue."""
+    _log_listener.start()
+    root = logging.getLogger()
+    root.addHandler(_log_queue_handler)
+    root.removeHandler(_log_stream_handler)
+
+
+def _stop_log_listener() -> None:
+    """
+    Routes root logging straight to the stream again, then stops the listener,
+    which writes out anything still queued. A restarted app starts it again.
+    """
+    root = logging.getLogger()
+    root.addHandler(_log_stream_handler)
+    root.removeHandler(_log_queue_handler)
+    _log_listener.stop()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # --- Logging ---
+    # The queue listener thread lives for one lifespan, like the LINE API client.
+    _start_log_listener()
+    try:
+        # --- Startup Configuration Checks ---
+        # Fail fast if required settings are missing, rather than on every request.
+        auth.validate_line_settings()
+
+        # --- Outbound HTTP ---
+        # The LINE API client lives for one lifespan and is closed on shutdown.
+        auth.open_http_client()
+
+        # --- Firebase Admin SDK Initialization ---
+        # Done at startup rather than at import time, off the event loop, and only
+        # once per process; see `initialize_firebase_app`.
+        await run_in_threadpool(initialize_firebase_app)
+
+        # --- Firestore Warm-up ---
+        # Open the Firestore connection while the container is still starting.
+        await run_in_threadpool(warm_up_firestore)
+        yield
+    finally:
+        # --- Shutdown ---
+        await auth.close_http_client()
+        _stop_log_listener()
 
 app = FastAPI(
     title="MegaCare Connect API",
     description="Backend API for the MegaCare Connect application.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # --- Custom Exception Handler for Validation Errors ---
@@ -40,16 +89,14 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     """
     Custom handler to log detailed validation errors for 422 responses.
     This helps in debugging malformed client-side requests.
-    The actual response is delegated back to FastAPI's default handler
-    to ensure it's processed correctly by middleware like CORS.
+    The response body is the same one FastAPI's default handler builds; exception
+    handler responses still pass through middleware like CORS.
     """
-    error_details = exc.errors()
-    logging.error(f"422 Unprocessable Entity. Request: {request.method} {request.url}. Errors: {error_details}")
-
-    # By calling the default handler, we ensure the response format is
-    # consistent and that it passes through the middleware chain correctly.
-    from fastapi.exception_handlers import request_validation_exception_handler
-    return await request_validation_exception_handler(request, exc)
+    error_details = jsonable_encoder(exc.errors())
+    # A 422 is a client error, so it is logged as a warning; arguments are only
+    # formatted if the record is emitted.
+    logger.warning("422 Unprocessable Entity. Request: %s %s. Errors: %s", request.method, request.url, error_details)
+    return JSONResponse(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, content={"detail": error_details})
 
 # --- CORS Middleware ---
 # To allow any origin to access your API, you can use a wildcard "*".
@@ -63,8 +110,10 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
     allow_credentials=False,
-    allow_methods=["*"], # Allows all methods (GET, POST, etc.)
+    allow_methods=["GET", "POST"], # The only methods the API exposes; keeps preflight responses short
     allow_headers=["*"], # Allows all headers, including Authorization
+    max_age=86400, # Let browsers cache preflight responses for a day instead of Starlette's 10-minute default
+    expose_headers=["X-Next-Start-After"], # Lets cross-origin clients read the clinician patient-list page cursor
 )
 
 app.include_router(customers.router, prefix="/api/v1/customers", tags=["Customers"])
@@ -1,3 +1,10 @@
+import logging
+import time
+from contextlib import ExitStack
+from types import SimpleNamespace
+
+import httpx
+import jwt
 import pytest
 from fastapi.testclient import TestClient
 from google.cloud.firestore_v1.base_query import FieldFilter
@@ -21,78 +28,88 @@ client = TestClient(app)
 FAKE_LINE_USER_ID = "U1234567890abcdef1234567890abcdef"
 FAKE_FIREBASE_UID = "firebase-uid-for-existing-user"
 FAKE_LINE_CHANNEL_ID = "fake_channel_id"
+FAKE_LINE_CHANNEL_SECRET = "fake_channel_secret_0123456789abcdef"
 FAKE_DISPLAY_NAME = "Test User"
 FAKE_PICTURE_URL = "http://example.com/pic.jpg"
 FAKE_EMAIL = "test@example.com"
-FAKE_ID_TOKEN = "fake.id.token"
 FAKE_FIREBASE_TOKEN = "fake.firebase.custom.token"
+LINE_LOGIN_PAYLOAD = {
+    "authorization_code": "some_auth_code",
+    "redirect_uri": "http://localhost/callback"
+}
 
-# This is what we expect jwt.decode to return
+# The claims LINE puts in the ID token
 DECODED_ID_TOKEN = {
     "iss": "https://access.line.me",
     "sub": FAKE_LINE_USER_ID,
     "aud": FAKE_LINE_CHANNEL_ID,
-    "exp": 1678886400,
-    "iat": 1678882800,
+    "exp": int(time.time()) + 3600,
+    "iat": int(time.time()),
     "name": FAKE_DISPLAY_NAME,
     "picture": FAKE_PICTURE_URL,
     "email": FAKE_EMAIL,
 }
+# Signed once with the fake channel secret, so the endpoint's real
+# signature/audience/issuer verification runs instead of a patched jwt.decode.
+FAKE_ID_TOKEN = jwt.encode(DECODED_ID_TOKEN, FAKE_LINE_CHANNEL_SECRET, algorithm="HS256")
+
+# Every test here drives the LINE login flow, so the patches are applied once
+# by an autouse fixture instead of being re-stacked on each test.
+@pytest.fixture(autouse=True)
+def line_login_mocks(monkeypatch):
+    monkeypatch.setattr(auth, 'LINE_CHANNEL_ID', FAKE_LINE_CHANNEL_ID)
+    monkeypatch.setattr(auth, 'LINE_CHANNEL_SECRET', FAKE_LINE_CHANNEL_SECRET)
+    # The router is mounted without the app lifespan, so the test supplies the
+    # LINE API client the lifespan would otherwise open.
+    mock_http_client = AsyncMock(spec=httpx.AsyncClient)
+    monkeypatch.setattr(auth, 'http_client', mock_http_client)
+
+    with ExitStack() as stack:
+        mock_firestore_client = stack.enter_context(patch.object(auth.firestore, 'client'))
+        mock_create_token = stack.enter_context(patch.object(auth.auth, 'create_custom_token'))
+
+        # LINE's token endpoint reply. A real httpx.Response (with its request
+        # attached, so raise_for_status works) instead of a MagicMock tree.
+        mock_http_client.post.return_value = httpx.Response(
+            200,
+            json={"id_token": FAKE_ID_TOKEN},
+            request=httpx.Request("POST", auth.LINE_TOKEN_URL),
+        )
+
+        # The Firestore tree the login handler walks, built once here so tests
+        # only set what the lineId query returns.
+        mock_db = MagicMock()
+        mock_firestore_client.return_value = mock_db
+        mock_customers_ref = mock_db.collection.return_value
+        mock_line_id_query = mock_customers_ref.where.return_value.limit.return_value
 
-# Common setup for mocks in a fixture to avoid repetition
-@pytest.fixture
-def mock_line_api_flow():
-    with patch('app.api.v1.endpoints.auth.httpx.AsyncClient') as mock_httpx_client, \
-         patch('app.api.v1.endpoints.auth.jwt.decode') as mock_jwt_decode, \
-         patch('app.api.v1.endpoints.auth.LINE_CHANNEL_ID', FAKE_LINE_CHANNEL_ID), \
-         patch('app.api.v1.endpoints.auth.LINE_CHANNEL_SECRET', 'fake_channel_secret'):
-        
-        # Mock LINE API call
-        mock_line_response = MagicMock()
-        mock_line_response.status_code = 200
-        mock_line_response.json.return_value = {"id_token": FAKE_ID_TOKEN}
-        mock_async_client_instance = AsyncMock()
-        mock_async_client_instance.post.return_value = mock_line_response
-        mock_httpx_client.return_value.__aenter__.return_value = mock_async_client_instance
-
-        # Mock JWT decoding. The test doesn't need to verify the signature,
-        # just that the function is called and returns the expected payload.
-        mock_jwt_decode.return_value = DECODED_ID_TOKEN
-        
-        yield mock_httpx_client, mock_jwt_decode
+        yield SimpleNamespace(
+            http_client=mock_http_client,
+            http_post=mock_http_client.post,
+            firestore=mock_firestore_client,
+            create_token=mock_create_token,
+            db=mock_db,
+            customers_ref=mock_customers_ref,
+            line_id_query=mock_line_id_query,
+        )
 
 # --- Test Cases ---
 
-@patch('app.api.v1.endpoints.auth.auth.create_custom_token')
-@patch('app.api.v1.endpoints.auth.firestore.client')
-def test_line_login_existing_user_success(mock_firestore_client, mock_create_token, mock_line_api_flow):
+def test_line_login_existing_user_success(line_login_mocks):
     """
     Tests the successful login flow where a user with a matching lineId
     already exists in the 'customers' collection.
     """
     # Arrange
-    mock_query = MagicMock()
     # 1. Mock Firestore to find an existing user
-    mock_db = MagicMock()
-    mock_firestore_client.return_value = mock_db
-    mock_collection_ref = MagicMock()
-    mock_db.collection.return_value = mock_collection_ref
-
     mock_customer_doc = MagicMock()
     mock_customer_doc.id = FAKE_FIREBASE_UID # The doc ID is the Firebase UID
-
-    mock_collection_ref.where.return_value.limit.return_value = mock_query
-    mock_query.stream.return_value = [mock_customer_doc]
+    line_login_mocks.line_id_query.stream.return_value = iter([mock_customer_doc])
 
     # 2. Mock Firebase token creation
-    mock_create_token.return_value = FAKE_FIREBASE_TOKEN
+    line_login_mocks.create_token.return_value = FAKE_FIREBASE_TOKEN
 
-    request_payload = {
-        "authorization_code": "some_auth_code",
-        "redirect_uri": "http://localhost/callback"
-    }
-
-    response = client.post("/api/v1/auth/line", json=request_payload)
+    response = client.post("/api/v1/auth/line", json=LINE_LOGIN_PAYLOAD)
 
     # Assert
     assert response.status_code == 200
@@ -101,11 +118,15 @@ def test_line_login_existing_user_success(mock_firestore_client, mock_create_tok
     assert response_data["firebase_token"] == FAKE_FIREBASE_TOKEN
     assert response_data["line_profile"] is None
 
+    # The code exchange goes through the shared LINE API client.
+    line_login_mocks.http_post.assert_awaited_once()
+    assert line_login_mocks.http_post.call_args.args[0] == auth.LINE_TOKEN_URL
+
     # Assert Firestore and Firebase Auth interactions
-    mock_db.collection.assert_called_once_with("customers")
+    line_login_mocks.db.collection.assert_called_once_with("customers")
     # Assert the where clause by inspecting the filter object
-    mock_collection_ref.where.assert_called_once()
-    _call_args, call_kwargs = mock_collection_ref.where.call_args
+    line_login_mocks.customers_ref.where.assert_called_once()
+    _call_args, call_kwargs = line_login_mocks.customers_ref.where.call_args
     called_filter = call_kwargs.get('filter')
     assert isinstance(called_filter, FieldFilter)
     assert called_filter.field_path == "lineId"
@@ -113,33 +134,20 @@ def test_line_login_existing_user_success(mock_firestore_client, mock_create_tok
     assert called_filter.value == FAKE_LINE_USER_ID
     # Assert that custom claims are now being passed
     expected_claims = {'provider': 'line', 'line_user_id': FAKE_LINE_USER_ID}
-    mock_create_token.assert_called_once_with(FAKE_FIREBASE_UID, expected_claims)
+    line_login_mocks.create_token.assert_called_once_with(FAKE_FIREBASE_UID, expected_claims)
 
 
-@patch('app.api.v1.endpoints.auth.auth.create_custom_token')
-@patch('app.api.v1.endpoints.auth.firestore.client')
-def test_line_login_new_user_registration_required(mock_firestore_client, mock_create_token, mock_line_api_flow):
+def test_line_login_new_user_registration_required(line_login_mocks):
     """
     Tests the registration flow where no user with a matching lineId
     is found, requiring the client to proceed with registration.
     """
     # Arrange
-    mock_query = MagicMock()
     # 1. Mock Firestore to find NO user
-    mock_db = MagicMock()
-    mock_firestore_client.return_value = mock_db
-    mock_collection_ref = MagicMock()
-    mock_db.collection.return_value = mock_collection_ref
-    mock_collection_ref.where.return_value.limit.return_value = mock_query
-    mock_query.stream.return_value = []  # No documents found
-
-    request_payload = {
-        "authorization_code": "some_auth_code",
-        "redirect_uri": "http://localhost/callback"
-    }
+    line_login_mocks.line_id_query.stream.return_value = iter([])  # No documents found
 
     # Act
-    response = client.post("/api/v1/auth/line", json=request_payload)
+    response = client.post("/api/v1/auth/line", json=LINE_LOGIN_PAYLOAD)
 
     # Assert
     assert response.status_code == 200
@@ -155,8 +163,8 @@ def test_line_login_new_user_registration_required(mock_firestore_client, mock_c
     assert line_profile["email"] == FAKE_EMAIL
 
     # Assert the where clause by inspecting the filter object
-    mock_collection_ref.where.assert_called_once()
-    _call_args, call_kwargs = mock_collection_ref.where.call_args
+    line_login_mocks.customers_ref.where.assert_called_once()
+    _call_args, call_kwargs = line_login_mocks.customers_ref.where.call_args
     called_filter = call_kwargs.get('filter')
     assert isinstance(called_filter, FieldFilter)
     assert called_filter.field_path == "lineId"
@@ -164,4 +172,102 @@ def test_line_login_new_user_registration_required(mock_firestore_client, mock_c
     assert called_filter.value == FAKE_LINE_USER_ID
 
     # Assert that no Firebase token was created
-    mock_create_token.assert_not_called()
\ No newline at end of file
+    line_login_mocks.create_token.assert_not_called()
+
+def test_line_login_token_creation_failure(line_login_mocks):
+    """
+    Tests that a failure to mint the Firebase custom token is reported as such,
+    rather than being rewritten into the generic database error.
+    """
+    # Arrange
+    mock_customer_doc = MagicMock()
+    mock_customer_doc.id = FAKE_FIREBASE_UID
+    line_login_mocks.line_id_query.stream.return_value = iter([mock_customer_doc])
+    line_login_mocks.create_token.side_effect = ValueError("signing failed")
+
+    # Act
+    response = client.post("/api/v1/auth/line", json=LINE_LOGIN_PAYLOAD)
+
+    # Assert
+    assert response.status_code == 500
+    assert response.json()["detail"] == "Failed to generate authentication token."
+
+def test_line_profile_success(line_login_mocks):
+    """
+    Tests that /line/profile exchanges the code and returns the LINE profile
+    from the verified ID token, without touching Firestore or Firebase Auth.
+    """
+    # Act
+    response = client.post("/api/v1/auth/line/profile", json=LINE_LOGIN_PAYLOAD)
+
+    # Assert
+    assert response.status_code == 200
+    assert response.json() == {
+        "line_user_id": FAKE_LINE_USER_ID,
+        "display_name": FAKE_DISPLAY_NAME,
+        "picture_url": FAKE_PICTURE_URL,
+        "email": FAKE_EMAIL,
+    }
+    line_login_mocks.http_post.assert_awaited_once()
+    _call_args, call_kwargs = line_login_mocks.http_post.call_args
+    assert call_kwargs["data"]["code"] == LINE_LOGIN_PAYLOAD["authorization_code"]
+    line_login_mocks.firestore.assert_not_called()
+    line_login_mocks.create_token.assert_not_called()
+
+def test_line_profile_line_api_error(line_login_mocks):
+    """Tests that a LINE token-endpoint error is reported as a 400 with LINE's description."""
+    # Arrange
+    line_login_mocks.http_post.return_value = httpx.Response(
+        400,
+        json={"error": "invalid_grant", "error_description": "invalid authorization code"},
+        request=httpx.Request("POST", auth.LINE_TOKEN_URL),
+    )
+
+    # Act
+    response = client.post("/api/v1/auth/line/profile", json=LINE_LOGIN_PAYLOAD)
+
+    # Assert
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Failed to exchange LINE authorization code: invalid authorization code"
+
+def test_http_client_opened_for_each_lifespan(monkeypatch, line_login_mocks):
+    """
+    Tests that each app lifespan opens its own LINE API client, with the LINE
+    timeout, and closes it at shutdown, also when the app starts again in the
+    same process.
+    """
+    from app import main
+
+    # Startup also initializes Firebase; that is outside what is tested here.
+    monkeypatch.setattr(main, "initialize_firebase_app", lambda: None)
+    monkeypatch.setattr(main, "warm_up_firestore", lambda: None)
+
+    # Importing the app does not start the logging queue; each lifespan does.
+    root_logger = logging.getLogger()
+    assert main._log_queue_handler not in root_logger.handlers
+
+    lifespan_clients = []
+    for _ in range(2):
+        with TestClient(main.app):
+            assert main._log_queue_handler in root_logger.handlers
+            lifespan_client = auth.http_client
+            assert isinstance(lifespan_client, httpx.AsyncClient)
+            assert not lifespan_client.is_closed
+            assert lifespan_client.timeout == httpx.Timeout(10.0)
+            lifespan_clients.append(lifespan_client)
+        assert lifespan_client.is_closed
+        assert auth.http_client is None
+        assert main._log_queue_handler not in root_logger.handlers
+
+    assert lifespan_clients[0] is not lifespan_clients[1]
+    # The test's own client was replaced, never closed by the lifespan.
+    line_login_mocks.http_client.aclose.assert_not_awaited()
+
+@pytest.mark.parametrize("missing_setting", ["LINE_CHANNEL_ID", "LINE_CHANNEL_SECRET"])
+def test_validate_line_settings_requires_credentials(monkeypatch, missing_setting):
+    """Tests that startup refuses to run when either LINE channel setting is unset."""
+    auth.validate_line_settings()  # Both set by the autouse fixture
+
+    monkeypatch.setattr(auth, missing_setting, None)
+    with pytest.raises(RuntimeError, match="LINE_CHANNEL_ID and LINE_CHANNEL_SECRET must be set"):
+        auth.validate_line_settings()
@@ -1,5 +1,6 @@
 import pytest
 from fastapi.testclient import TestClient
+from types import SimpleNamespace
 from unittest.mock import patch, MagicMock
 from datetime import datetime, date, timezone
 from google.cloud.firestore_v1.query import Query
@@ -22,6 +23,40 @@ FAKE_PATIENT_UID_2 = "patient-ghi-789"
 
 FAKE_CLINICIAN_USER = {"uid": FAKE_CLINICIAN_UID, "email": "clinician@example.com"}
 
+FIXED_SETUP_DATE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+# Document stubs return a copy of this data from to_dict() because the handlers
+# add the document ID to the dict they receive.
+PATIENT_1_DATA = {
+    "displayName": "Patient One",
+    "firstName": "Patient",
+    "lastName": "One",
+    "dob": datetime(1990, 1, 1),
+    "setupDate": FIXED_SETUP_DATE,
+    "status": "Active",
+    "lineProfile": None
+}
+PATIENT_2_DATA = {
+    "displayName": "Patient Two", "firstName": "Patient",
+    "lastName": "Two", "dob": datetime(1991, 2, 2),
+    "setupDate": FIXED_SETUP_DATE, "status": "Active", "lineProfile": None
+}
+REPORT_1_DATA = {
+    "reportDate": datetime(2023, 10, 27), "usageHours": 8.0,
+    "leak": {"median": 5.0},
+    "pressure": {"median": 9.0},
+    "eventsPerHour": {"ahi": 4.2}
+}
+REPORT_2_DATA = {
+    "reportDate": datetime(2023, 10, 26),
+    "usageHours": 7.5,
+    "leak": {"median": 6.0},
+    "pressure": {"median": 9.2},
+    "eventsPerHour": {"ahi": 5.1}
+}
+REPORT_DOC_1 = SimpleNamespace(id="2023-10-27", to_dict=REPORT_1_DATA.copy)
+REPORT_DOC_2 = SimpleNamespace(id="2023-10-26", to_dict=REPORT_2_DATA.copy)
+
 # This function will replace the `get_current_user` dependency
 def override_get_current_user():
     return FAKE_CLINICIAN_USER
@@ -32,9 +67,15 @@ app.dependency_overrides[get_current_user] = override_get_current_user
 # Create a TestClient for making requests to our app
 client = TestClient(app)
 
+# Every endpoint here reads Firestore, so the client is patched once per test
+# by an autouse fixture rather than by a decorator on each test.
+@pytest.fixture(autouse=True)
+def mock_firestore_client():
+    with patch.object(clinicians.firestore, 'client') as mock_client:
+        yield mock_client
+
 # --- Test Cases ---
 
-@patch('app.api.v1.endpoints.clinicians.firestore.client')
 def test_get_assigned_patients_success(mock_firestore_client):
     """Tests successful retrieval of assigned patients for a clinician."""
     # Arrange
@@ -49,47 +90,26 @@ def test_get_assigned_patients_success(mock_firestore_client):
     mock_clinician_ref.get.return_value = mock_clinician_doc
 
     # Mock patient documents and references
-    mock_patient_doc_1 = MagicMock()
-    mock_patient_doc_1.exists = True
-    mock_patient_doc_1.id = FAKE_PATIENT_UID_1
-    mock_patient_doc_1.to_dict.return_value = {
-        "displayName": "Patient One",
-        "firstName": "Patient",
-        "lastName": "One",
-        "dob": datetime(1990, 1, 1),
-        "setupDate": datetime.now(),
-        "status": "Active",
-        "lineProfile": None
-    }
+    mock_patient_doc_1 = SimpleNamespace(exists=True, id=FAKE_PATIENT_UID_1, to_dict=PATIENT_1_DATA.copy)
     mock_patient_ref_1 = MagicMock()
     mock_patient_ref_1.get.return_value = mock_patient_doc_1
 
-    mock_patient_doc_2 = MagicMock()
-    mock_patient_doc_2.exists = True
-    mock_patient_doc_2.id = FAKE_PATIENT_UID_2
-    mock_patient_doc_2.to_dict.return_value = {
-        "displayName": "Patient Two", "firstName": "Patient",
-        "lastName": "Two", "dob": datetime(1991, 2, 2),
-        "setupDate": datetime.now(), "status": "Active", "lineProfile": None
-    }
+    mock_patient_doc_2 = SimpleNamespace(exists=True, id=FAKE_PATIENT_UID_2, to_dict=PATIENT_2_DATA.copy)
     mock_patient_ref_2 = MagicMock()
     mock_patient_ref_2.get.return_value = mock_patient_doc_2
 
-    # Firestore call routing
-    def collection_router(collection_name):
-        if collection_name == "clinicians":
-            mock_collection = MagicMock()
-            mock_collection.document.return_value = mock_clinician_ref
-            return mock_collection
-        elif collection_name == "customers":
-            mock_collection = MagicMock()
-            def document_router(doc_id):
-                if doc_id == FAKE_PATIENT_UID_1: return mock_patient_ref_1
-                if doc_id == FAKE_PATIENT_UID_2: return mock_patient_ref_2
-                return MagicMock()
-            mock_collection.document.side_effect = document_router
-            return mock_collection
-    mock_db.collection.side_effect = collection_router
+    # Firestore call routing: plain dict lookups by collection name and document ID
+    mock_clinicians_collection = MagicMock()
+    mock_clinicians_collection.document.return_value = mock_clinician_ref
+    mock_customers_collection = MagicMock()
+    mock_customers_collection.document.side_effect = {
+        FAKE_PATIENT_UID_1: mock_patient_ref_1,
+        FAKE_PATIENT_UID_2: mock_patient_ref_2,
+    }.__getitem__
+    mock_db.collection.side_effect = {
+        "clinicians": mock_clinicians_collection,
+        "customers": mock_customers_collection,
+    }.__getitem__
 
     # Act
     response = client.get("/api/v1/clinician/patients")
@@ -102,8 +122,9 @@ def test_get_assigned_patients_success(mock_firestore_client):
     assert response_data[0]["first_name"] == "Patient"
     assert response_data[1]["patient_id"] == FAKE_PATIENT_UID_2
     assert response_data[1]["last_name"] == "Two"
+    # Only the fields the Customer response declares are read from Firestore.
+    mock_patient_ref_1.get.assert_called_once_with(field_paths=clinicians.schemas.CUSTOMER_FIELD_PATHS)
 
-@patch('app.api.v1.endpoints.clinicians.firestore.client')
 def test_get_assigned_patients_clinician_not_found(mock_firestore_client):
     """Tests 404 when the clinician profile does not exist."""
     # Arrange
@@ -120,7 +141,101 @@ def test_get_assigned_patients_clinician_not_found(mock_firestore_client):
     assert response.status_code == 404
     assert response.json()["detail"] == "Clinician profile not found"
 
-@patch('app.api.v1.endpoints.clinicians.firestore.client')
+def route_assigned_patients(mock_firestore_client, assigned_patients):
+    """Routes Firestore so the clinician is assigned `assigned_patients`, each with an existing profile."""
+    mock_db = MagicMock()
+    mock_firestore_client.return_value = mock_db
+
+    mock_clinician_doc = MagicMock()
+    mock_clinician_doc.exists = True
+    mock_clinician_doc.to_dict.return_value = {"assignedPatients": assigned_patients}
+
+    mock_clinicians_collection = MagicMock()
+    mock_clinicians_collection.document.return_value.get.return_value = mock_clinician_doc
+
+    def customer_ref_for(doc_id):
+        mock_doc = SimpleNamespace(
+            exists=True, id=doc_id,
+            to_dict=lambda: {"displayName": doc_id, "setupDate": FIXED_SETUP_DATE},
+        )
+        mock_ref = MagicMock()
+        mock_ref.get.return_value = mock_doc
+        return mock_ref
+
+    mock_customers_collection = MagicMock()
+    mock_customers_collection.document.side_effect = customer_ref_for
+    mock_db.collection.side_effect = {
+        "clinicians": mock_clinicians_collection,
+        "customers": mock_customers_collection,
+    }.__getitem__
+    return mock_customers_collection
+
+def fetch_all_pages(limit):
+    """Follows `X-Next-Start-After` from the first page to the last and returns the pages' patient IDs."""
+    pages, params = [], {"limit": limit}
+    while True:
+        response = client.get("/api/v1/clinician/patients", params=params)
+        assert response.status_code == 200
+        pages.append([p["patient_id"] for p in response.json()])
+        next_cursor = response.headers.get("X-Next-Start-After")
+        if next_cursor is None:
+            return pages
+        params = {"limit": limit, "startAfter": next_cursor}
+
+def test_get_assigned_patients_paginates(mock_firestore_client):
+    """Tests that only the page after the `startAfter` cursor is fetched."""
+    # Arrange
+    mock_customers_collection = route_assigned_patients(mock_firestore_client, ["p1", "p2", "p3", "p4"])
+
+    # Act
+    response = client.get("/api/v1/clinician/patients", params={"limit": 2, "startAfter": "p1"})
+
+    # Assert
+    assert response.status_code == 200
+    assert [p["patient_id"] for p in response.json()] == ["p2", "p3"]
+    assert [c.args[0] for c in mock_customers_collection.document.call_args_list] == ["p2", "p3"]
+    assert response.headers["X-Next-Start-After"] == "p3"
+
+    # The last page carries no cursor.
+    response = client.get("/api/v1/clinician/patients", params={"limit": 2, "startAfter": "p3"})
+    assert [p["patient_id"] for p in response.json()] == ["p4"]
+    assert "X-Next-Start-After" not in response.headers
+
+    # An unknown cursor is rejected rather than silently restarting from the beginning.
+    response = client.get("/api/v1/clinician/patients", params={"startAfter": "nope"})
+    assert response.status_code == 400
+
+def test_get_assigned_patients_more_than_one_page(mock_firestore_client):
+    """Tests that over 100 assigned patients are all returned by default, and reachable page by page."""
+    # Arrange
+    assigned = [f"patient-{n:03d}" for n in range(250)]
+    route_assigned_patients(mock_firestore_client, assigned)
+
+    # Act
+    response = client.get("/api/v1/clinician/patients")
+
+    # Assert: without `limit` the full list comes back, as before paging existed.
+    assert response.status_code == 200
+    assert [p["patient_id"] for p in response.json()] == assigned
+    assert "X-Next-Start-After" not in response.headers
+
+    pages = fetch_all_pages(limit=100)
+    assert [len(page) for page in pages] == [100, 100, 50]
+    assert sum(pages, []) == assigned
+
+def test_get_assigned_patients_duplicate_uids(mock_firestore_client):
+    """
+    Tests that the unpaged list is returned as stored, while paging skips
+    duplicated UIDs in `assignedPatients` and still terminates.
+    """
+    # Arrange
+    route_assigned_patients(mock_firestore_client, ["p1", "p2", "p1", "p3", "p2"])
+
+    # Act / Assert
+    response = client.get("/api/v1/clinician/patients")
+    assert [p["patient_id"] for p in response.json()] == ["p1", "p2", "p1", "p3", "p2"]
+    assert fetch_all_pages(limit=1) == [["p1"], ["p2"], ["p3"]]
+
 def test_get_patient_profile_unauthorized(mock_firestore_client):
     """Tests 403 Forbidden when trying to access a non-assigned patient."""
     # Arrange
@@ -139,10 +254,15 @@ def test_get_patient_profile_unauthorized(mock_firestore_client):
     # Assert
     assert response.status_code == 403
     assert "not authorized" in response.json()["detail"]
-
-@patch('app.api.v1.endpoints.clinicians.firestore.client')
-def test_get_patient_daily_reports_success(mock_firestore_client):
-    """Tests successful retrieval of a specific patient's daily reports."""
+    # Only the clinician document was read; the patient's profile never was.
+    mock_db.collection.return_value.document.return_value.get.assert_called_once_with()
+
+@pytest.mark.parametrize("params, report_docs, expected_limit", [
+    ({"limit": 5}, [REPORT_DOC_1, REPORT_DOC_2], 5),
+    ({}, [], 30),  # No reports; default page size
+], ids=["reports", "no_reports"])
+def test_get_patient_daily_reports(mock_firestore_client, params, report_docs, expected_limit):
+    """Tests retrieval of a specific patient's daily reports, including a patient with none."""
     # Arrange
     mock_db = MagicMock()
     mock_firestore_client.return_value = mock_db
@@ -154,70 +274,23 @@ def test_get_patient_daily_reports_success(mock_firestore_client):
     mock_db.collection.return_value.document.return_value.get.return_value = mock_clinician_doc
 
     # Mock daily reports stream
-    mock_report_1 = MagicMock()
-    mock_report_1.id = "2023-10-27"
-    mock_report_1.to_dict.return_value = {
-        "reportDate": datetime(2023, 10, 27), "usageHours": 8.0,
-        "leak": {"median": 5.0},
-        "pressure": {"median": 9.0},
-        "eventsPerHour": {"ahi": 4.2}
-    }
-
-    mock_report_2 = MagicMock()
-    mock_report_2.id = "2023-10-26"
-    mock_report_2.to_dict.return_value = {
-        "reportDate": datetime(2023, 10, 26),
-        "usageHours": 7.5,
-        "leak": {"median": 6.0},
-        "pressure": {"median": 9.2},
-        "eventsPerHour": {"ahi": 5.1}
-    }
-
     mock_query = MagicMock()
-    mock_query.stream.return_value = [mock_report_1, mock_report_2]
-    
+    mock_query.stream.return_value = report_docs
     mock_reports_ref = MagicMock()
-    mock_reports_ref.order_by.return_value.limit.return_value = mock_query
+    mock_reports_ref.order_by.return_value.limit.return_value.select.return_value = mock_query
 
     # Route the call to the subcollection
     mock_db.collection.return_value.document.return_value.collection.return_value = mock_reports_ref
 
     # Act
-    response = client.get(f"/api/v1/clinician/patients/{FAKE_PATIENT_UID_1}/dailyReports?limit=5")
+    response = client.get(f"/api/v1/clinician/patients/{FAKE_PATIENT_UID_1}/dailyReports", params=params)
 
     # Assert
     assert response.status_code == 200
     response_data = response.json()
-    assert len(response_data) == 2
-    assert response_data[0]["report_id"] == "2023-10-27"
-    assert response_data[0]["usage_hours"] == 8.0
-    assert response_data[1]["report_id"] == "2023-10-26"
+    assert [r["report_id"] for r in response_data] == [doc.id for doc in report_docs]
+    assert [r["usage_hours"] for r in response_data] == [doc.to_dict()["usageHours"] for doc in report_docs]
 
     # Verify query parameters were used
     mock_reports_ref.order_by.assert_called_with("reportDate", direction=Query.DESCENDING) # type: ignore
-    mock_reports_ref.order_by.return_value.limit.assert_called_with(5)
-
-@patch('app.api.v1.endpoints.clinicians.firestore.client')
-def test_get_patient_daily_reports_no_reports(mock_firestore_client):
-    """Tests returning an empty list when a patient has no reports."""
-    # Arrange
-    mock_db = MagicMock()
-    mock_firestore_client.return_value = mock_db
-
-    mock_clinician_doc = MagicMock()
-    mock_clinician_doc.exists = True
-    mock_clinician_doc.to_dict.return_value = {"assignedPatients": [FAKE_PATIENT_UID_1]}
-    mock_db.collection.return_value.document.return_value.get.return_value = mock_clinician_doc
-
-    mock_query = MagicMock()
-    mock_query.stream.return_value = [] # No reports
-    mock_reports_ref = MagicMock()
-    mock_reports_ref.order_by.return_value.limit.return_value = mock_query
-    mock_db.collection.return_value.document.return_value.collection.return_value = mock_reports_ref
-
-    # Act
-    response = client.get(f"/api/v1/clinician/patients/{FAKE_PATIENT_UID_1}/dailyReports")
-
-    # Assert
-    assert response.status_code == 200
-    assert response.json() == []
\ No newline at end of file
+    mock_reports_ref.order_by.return_value.limit.assert_called_with(expected_limit)
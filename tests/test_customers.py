@@ -1,6 +1,7 @@
 import pytest
 from fastapi.testclient import TestClient
 from google.cloud.firestore_v1.base_query import FieldFilter, And
+from google.api_core.exceptions import AlreadyExists
 from unittest.mock import patch, MagicMock
 from datetime import datetime, date, timezone
 
@@ -44,30 +45,6 @@ def test_create_customer_profile_success(mock_firestore_client):
     mock_customer_ref = MagicMock()
     mock_db.collection.return_value.document.return_value = mock_customer_ref
 
-    # Mock the two .get() calls inside the endpoint
-    mock_doc_nonexistent = MagicMock()
-    mock_doc_nonexistent.exists = False
-    
-    mock_doc_existent = MagicMock()
-    mock_doc_existent.exists = True
-    mock_doc_existent.id = FAKE_USER_UID
-    # This is the data we expect to be returned from the DB after creation
-    # Firestore returns datetime objects for Timestamps
-    expected_db_data = {
-        "displayName": "Paripol Live Test 1",
-        "firstName": "Paripol",
-        "lastName": "Tester",
-        "dob": datetime(1992, 5, 20, 0, 0),
-        "phoneNumber": "0812345678",
-        "status": "Active",
-        "setupDate": datetime.now(timezone.utc), # The exact value is set in the endpoint
-        "lineProfile": None
-    }
-    mock_doc_existent.to_dict.return_value = expected_db_data
-    
-    # The first call to .get() finds no existing profile, the second one finds the new one
-    mock_customer_ref.get.side_effect = [mock_doc_nonexistent, mock_doc_existent]
-
     request_payload = {
         "display_name": "Paripol Live Test 1",
         "first_name": "Paripol",
@@ -88,16 +65,18 @@ def test_create_customer_profile_success(mock_firestore_client):
     mock_db.collection.return_value.document.assert_called_once_with(FAKE_USER_UID)
     
     # This is the crucial check for the date conversion fix
-    mock_customer_ref.set.assert_called_once()
-    call_args, call_kwargs = mock_customer_ref.set.call_args
+    mock_customer_ref.create.assert_called_once()
+    mock_customer_ref.set.assert_not_called()
+    call_args, _call_kwargs = mock_customer_ref.create.call_args
     data_sent_to_firestore = call_args[0]
     
     assert isinstance(data_sent_to_firestore["dob"], datetime)
     assert data_sent_to_firestore["phoneNumber"] == "0812345678"
-    assert "merge" not in call_kwargs
     assert data_sent_to_firestore["dob"] == datetime(1992, 5, 20, 0, 0) # type: ignore
     assert "setupDate" in data_sent_to_firestore # type: ignore
     assert isinstance(data_sent_to_firestore["setupDate"], datetime) # type: ignore
+    # create() is atomic, so the document is neither pre-checked nor read back
+    mock_customer_ref.get.assert_not_called()
     
     # Verify the response payload
     response_data = response.json()
@@ -120,10 +99,8 @@ def test_create_customer_profile_conflict(mock_firestore_client):
     mock_customer_ref = MagicMock()
     mock_db.collection.return_value.document.return_value = mock_customer_ref
     
-    # Mock that the document *already exists*
-    mock_doc_existent = MagicMock()
-    mock_doc_existent.exists = True
-    mock_customer_ref.get.return_value = mock_doc_existent
+    # Mock that the document *already exists*; create() rejects the write
+    mock_customer_ref.create.side_effect = AlreadyExists("Document already exists")
 
     request_payload = {
         "display_name": "Some Name",
@@ -138,6 +115,7 @@ def test_create_customer_profile_conflict(mock_firestore_client):
     # Assert
     assert response.status_code == 409
     assert "already exists" in response.json()["detail"]
+    mock_customer_ref.create.assert_called_once()
     mock_customer_ref.set.assert_not_called()
 
 
@@ -172,15 +150,15 @@ def test_get_my_profile_success(mock_firestore_client):
     mock_device_doc1 = MagicMock()
     mock_device_doc1.id = "device-id-1"
     mock_device_doc1.to_dict.return_value = device1_data
-    mock_devices_collection.stream.return_value = [mock_device_doc1]
+    mock_devices_collection.select.return_value.stream.return_value = [mock_device_doc1]
 
     # Mock masks sub-collection
     mock_masks_collection = MagicMock()
-    mock_masks_collection.stream.return_value = [] # No masks
+    mock_masks_collection.select.return_value.stream.return_value = [] # No masks
 
     # Mock airTubing sub-collection
     mock_airtubing_collection = MagicMock()
-    mock_airtubing_collection.stream.return_value = [] # No tubing
+    mock_airtubing_collection.select.return_value.stream.return_value = [] # No tubing
 
     # Make customer_ref.collection return the correct mock collection
     def collection_side_effect(name):
@@ -259,19 +237,6 @@ def test_submit_daily_report_success(mock_firestore_client):
         "events_per_hour": {"ahi": 4.2}
     }
     
-    # Mock the .get() call that happens after .set()
-    mock_report_snapshot = MagicMock()
-    mock_report_snapshot.exists = True
-    mock_report_snapshot.id = report_date_str
-    mock_report_snapshot.to_dict.return_value = {
-        "reportDate": report_datetime_obj, # type: ignore
-        "usageHours": 8.5, # type: ignore
-        "leak": {"median": 5.0, "95th_percentile": 20.0},
-        "pressure": {"median": 8.0, "95th_percentile": 12.0},
-        "eventsPerHour": {"ahi": 4.2} # type: ignore
-    }
-    mock_report_ref.get.return_value = mock_report_snapshot
-
     # Act
     response = client.post("/api/v1/customers/me/dailyReports", json=request_payload)
 
@@ -289,6 +254,8 @@ def test_submit_daily_report_success(mock_firestore_client):
     
     assert isinstance(data_sent_to_firestore["reportDate"], datetime) # type: ignore
     assert data_sent_to_firestore["reportDate"] == report_datetime_obj # type: ignore
+    # The report is not read back after the write
+    mock_report_ref.get.assert_not_called()
     
     # Verify response
     response_data = response.json()
@@ -297,6 +264,30 @@ def test_submit_daily_report_success(mock_firestore_client):
     assert response_data["usage_hours"] == 8.5
 
 
+@pytest.mark.parametrize("device_snapshot", ["x", [1, 2], 5])
+@patch('app.api.v1.endpoints.customers.firestore.client')
+def test_submit_daily_report_rejects_non_object_device_snapshot(mock_firestore_client, device_snapshot):
+    """Tests that deviceSnapshot must be a JSON object (or null) and is never stored otherwise."""
+    # Arrange
+    mock_db = MagicMock()
+    mock_firestore_client.return_value = mock_db
+    request_payload = {
+        "report_date": "2023-10-26",
+        "usage_hours": 8.5,
+        "leak": {"median": 5.0},
+        "pressure": {"median": 8.0},
+        "events_per_hour": {"ahi": 4.2},
+        "deviceSnapshot": device_snapshot,
+    }
+
+    # Act
+    response = client.post("/api/v1/customers/me/dailyReports", json=request_payload)
+
+    # Assert
+    assert response.status_code == 422
+    mock_db.collection.return_value.document.return_value.collection.return_value.document.return_value.set.assert_not_called()
+
+
 @patch('app.api.v1.endpoints.customers.firestore.client')
 def test_get_my_daily_reports_success(mock_firestore_client):
     """Tests successful retrieval of a list of daily reports."""
@@ -325,7 +316,7 @@ def test_get_my_daily_reports_success(mock_firestore_client):
 
     mock_query = MagicMock()
     mock_query.stream.return_value = [mock_doc1, mock_doc2]
-    mock_reports_ref.order_by.return_value.limit.return_value = mock_query
+    mock_reports_ref.order_by.return_value.limit.return_value.select.return_value = mock_query
 
     # Act
     response = client.get("/api/v1/customers/me/dailyReports?limit=10")
@@ -358,15 +349,8 @@ def test_add_device_success(mock_firestore_client):
         "status": "Active"
     }
 
-    # Mock the .get() call that happens after creation
-    mock_device_snapshot = MagicMock()
-    mock_device_snapshot.exists = True
-    mock_device_snapshot.id = "new-device-id"
-    mock_device_snapshot.to_dict.return_value = {
-        "deviceName": "AirSense 10", "serialNumber": "SN123456789", "deviceNumber": "123", "status": "Active",
-        "addedDate": datetime.now(timezone.utc)
-    }
-    mock_device_ref.get.return_value = mock_device_snapshot
+    # The response is built from the written data and the auto-generated ID
+    mock_device_ref.id = "new-device-id"
 
     # Act
     response = client.post("/api/v1/customers/me/devices", json=request_payload)
@@ -386,6 +370,8 @@ def test_add_device_success(mock_firestore_client):
     assert data_sent_to_firestore["deviceNumber"] == "123" # type: ignore
     assert "addedDate" in data_sent_to_firestore # type: ignore
     assert isinstance(data_sent_to_firestore["addedDate"], datetime) # type: ignore
+    # The new document is not read back after the write
+    mock_device_ref.get.assert_not_called()
 
     # Verify response
     response_data = response.json()
@@ -415,7 +401,7 @@ def test_get_my_devices_success(mock_firestore_client):
     mock_doc2.id = "device-id-2"
     mock_doc2.to_dict.return_value = device2_data
 
-    mock_device_subcollection.stream.return_value = [mock_doc1, mock_doc2]
+    mock_device_subcollection.select.return_value.stream.return_value = [mock_doc1, mock_doc2]
 
     # Act
     response = client.get("/api/v1/customers/me/devices")
@@ -431,6 +417,11 @@ def test_get_my_devices_success(mock_firestore_client):
     assert response_data[1]["device_name"] == "AirSense 11"
     assert response_data[1]["status"] == "Inactive"
     assert response_data[1]["device_number"] == "456"
+    # Only the stored fields the Device response declares are read from Firestore;
+    # the device ID comes from the document ID, not a field.
+    mock_device_subcollection.select.assert_called_once_with(customers.schemas.DEVICE_FIELD_PATHS)
+    assert "deviceId" not in customers.schemas.DEVICE_FIELD_PATHS
+    assert "deviceName" in customers.schemas.DEVICE_FIELD_PATHS
 
 @patch('app.api.v1.endpoints.customers.firestore.client')
 def test_add_mask_success(mock_firestore_client):
@@ -446,11 +437,7 @@ def test_add_mask_success(mock_firestore_client):
 
     request_payload = {"mask_name": "AirFit P10", "size": "M"}
 
-    mock_mask_snapshot = MagicMock()
-    mock_mask_snapshot.exists = True
-    mock_mask_snapshot.id = "new-mask-id"
-    mock_mask_snapshot.to_dict.return_value = {"maskName": "AirFit P10", "size": "M", "addedDate": datetime.now(timezone.utc)}
-    mock_mask_ref.get.return_value = mock_mask_snapshot
+    mock_mask_ref.id = "new-mask-id"
 
     # Act
     response = client.post("/api/v1/customers/me/masks", json=request_payload)
@@ -461,6 +448,7 @@ def test_add_mask_success(mock_firestore_client):
     response_data = response.json()
     assert response_data["mask_id"] == "new-mask-id"
     assert response_data["mask_name"] == "AirFit P10"
+    mock_mask_ref.get.assert_not_called()
 
 
 @patch('app.api.v1.endpoints.customers.firestore.client')
@@ -483,7 +471,7 @@ def test_get_my_masks_success(mock_firestore_client):
     mock_doc2.id = "mask-id-2"
     mock_doc2.to_dict.return_value = mask2_data
 
-    mock_mask_subcollection.stream.return_value = [mock_doc1, mock_doc2]
+    mock_mask_subcollection.select.return_value.stream.return_value = [mock_doc1, mock_doc2]
 
     # Act
     response = client.get("/api/v1/customers/me/masks")
@@ -512,11 +500,7 @@ def test_add_air_tubing_success(mock_firestore_client):
 
     request_payload = {"tubing_name": "ClimateLineAir"}
 
-    mock_tubing_snapshot = MagicMock()
-    mock_tubing_snapshot.exists = True
-    mock_tubing_snapshot.id = "new-tubing-id"
-    mock_tubing_snapshot.to_dict.return_value = {"tubingName": "ClimateLineAir", "addedDate": datetime.now(timezone.utc)}
-    mock_tubing_ref.get.return_value = mock_tubing_snapshot
+    mock_tubing_ref.id = "new-tubing-id"
 
     # Act
     response = client.post("/api/v1/customers/me/airTubing", json=request_payload)
@@ -527,6 +511,7 @@ def test_add_air_tubing_success(mock_firestore_client):
     response_data = response.json()
     assert response_data["tubing_id"] == "new-tubing-id"
     assert response_data["tubing_name"] == "ClimateLineAir"
+    mock_tubing_ref.get.assert_not_called()
 
 
 @patch('app.api.v1.endpoints.customers.firestore.client')
@@ -549,7 +534,7 @@ def test_get_my_air_tubing_success(mock_firestore_client):
     mock_doc2.id = "tubing-id-2"
     mock_doc2.to_dict.return_value = tubing2_data
 
-    mock_tubing_subcollection.stream.return_value = [mock_doc1, mock_doc2]
+    mock_tubing_subcollection.select.return_value.stream.return_value = [mock_doc1, mock_doc2]
 
     # Act
     response = client.get("/api/v1/customers/me/airTubing")
@@ -565,8 +550,14 @@ def test_get_my_air_tubing_success(mock_firestore_client):
     assert response_data[1]["tubing_name"] == "SlimLine"
 
 
+@pytest.mark.parametrize("request_payload", [
+    {"serial_number": "SN123456789", "device_number": "987"},
+    # Surrounding whitespace (e.g. from a scanner or copy/paste) is stripped
+    # before the lookup and before the device is stored.
+    {"serial_number": "  SN123456789\n", "device_number": " 987 "},
+], ids=["exact", "padded"])
 @patch('app.api.v1.endpoints.customers.firestore.client')
-def test_link_device_preserves_line_profile(mock_firestore_client):
+def test_link_device_preserves_line_profile(mock_firestore_client, request_payload):
     """
     Tests that linking a device correctly merges pre-existing data
     while preserving the current user's lineProfile from their
@@ -591,7 +582,8 @@ def test_link_device_preserves_line_profile(mock_firestore_client):
     mock_pre_existing_customer_doc.to_dict.return_value = pre_existing_customer_data
     mock_pre_existing_customer_ref = MagicMock()
     mock_pre_existing_customer_ref.id = PRE_EXISTING_CUSTOMER_ID
-    mock_pre_existing_customer_ref.get.return_value = mock_pre_existing_customer_doc
+    mock_pre_existing_customer_ref.path = f"customers/{PRE_EXISTING_CUSTOMER_ID}"
+    mock_pre_existing_customer_doc.reference = mock_pre_existing_customer_ref
 
     mock_devices_collection_ref = MagicMock()
     mock_devices_collection_ref.parent = mock_pre_existing_customer_ref
@@ -604,7 +596,7 @@ def test_link_device_preserves_line_profile(mock_firestore_client):
     mock_device_doc.to_dict.return_value = mock_device_data
     mock_query = MagicMock()
     mock_collection_group_ref.where.return_value.limit.return_value = mock_query
-    mock_query.stream.return_value = [mock_device_doc]
+    mock_query.stream.return_value = iter([mock_device_doc])
 
     # --- Mocking the collection calls ---
     mock_customers_collection = MagicMock()
@@ -645,14 +637,16 @@ def test_link_device_preserves_line_profile(mock_firestore_client):
     mock_updated_doc.to_dict.return_value = final_merged_data
 
     mock_current_user_customer_ref = MagicMock()
+    mock_current_user_customer_ref.path = f"customers/{FAKE_USER_UID}"
+    mock_current_user_initial_doc.reference = mock_current_user_customer_ref
     mock_user_devices_collection = MagicMock()
     mock_current_user_customer_ref.collection.return_value = mock_user_devices_collection
-    # The first .get() retrieves the initial profile, the second .get() retrieves the final one.
-    mock_current_user_customer_ref.get.side_effect = [mock_current_user_initial_doc, mock_updated_doc]
+    # The initial profiles come from one batched get_all() (in any order);
+    # the final .get() retrieves the merged profile.
+    mock_db.get_all.return_value = [mock_current_user_initial_doc, mock_pre_existing_customer_doc]
+    mock_current_user_customer_ref.get.return_value = mock_updated_doc
     mock_customers_collection.document.return_value = mock_current_user_customer_ref
 
-    request_payload = {"serial_number": "SN123456789", "device_number": "987"}
-
     # Act
     response = client.post("/api/v1/customers/me/link-device", json=request_payload)
 
@@ -669,9 +663,12 @@ def test_link_device_preserves_line_profile(mock_firestore_client):
     assert len(called_filter.filters) == 2
     # Check for presence of both filters, order-independent
     filters = called_filter.filters
-    assert any(f.field_path == "serialNumber" and f.op_string == "==" and f.value == request_payload["serial_number"] for f in filters)
+    assert any(f.field_path == "serialNumber" and f.op_string == "==" and f.value == "SN123456789" for f in filters)
     assert any(f.field_path == "status" and f.op_string == "==" and f.value == "unlinked" for f in filters)
 
+    # Assert both profiles were read in a single batched call
+    mock_db.get_all.assert_called_once_with([mock_pre_existing_customer_ref, mock_current_user_customer_ref])
+
     # Assert that the copy to 'patient_list' collection DID NOT happen
     mock_patient_list_collection.document.assert_not_called()
 
@@ -700,6 +697,9 @@ def test_link_device_preserves_line_profile(mock_firestore_client):
     assert "deviceName" in added_device_data
     assert "addedDate" in added_device_data
 
+    # The merged profile is read back with only the fields the response declares
+    mock_current_user_customer_ref.get.assert_called_once_with(field_paths=customers.schemas.CUSTOMER_FIELD_PATHS)
+
     # Assert response
     response_data = response.json()
     assert response_data["patient_id"] == FAKE_USER_UID
@@ -773,7 +773,7 @@ def test_get_latest_prescription_success(mock_firestore_client):
     mock_doc = MagicMock()
     mock_doc.to_dict.return_value = prescription_db_data
     mock_query = MagicMock()
-    mock_query.stream.return_value = [mock_doc]
+    mock_query.stream.return_value = iter([mock_doc])
     mock_prescriptions_ref.order_by.return_value.limit.return_value = mock_query
 
     # Act
@@ -834,7 +834,7 @@ def test_get_latest_prescription_not_found(mock_firestore_client):
 
     # Mock that the query returns no documents
     mock_query = MagicMock()
-    mock_query.stream.return_value = [] # No documents found
+    mock_query.stream.return_value = iter([]) # No documents found
     mock_prescriptions_ref.order_by.return_value.limit.return_value = mock_query
 
     # Act